@@ -0,0 +1,59 @@
+# TG-UserBot - A modular Telegram UserBot script for Python.
+# Copyright (C) 2019  Kandarp <https://github.com/kandnub>
+#
+# TG-UserBot is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# TG-UserBot is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with TG-UserBot.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Shared helpers of the benchmark scripts.
+
+Run them from the repository's root, e.g. ``python benchmarks/matcher.py``.
+"""
+
+
+import os
+import sys
+import time
+import types
+from typing import Callable
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Importing the userbot package would start the client, register it without
+# running its __init__ so that the modules can be imported on their own
+if 'userbot' not in sys.modules:
+    package = types.ModuleType('userbot')
+    package.__path__ = [os.path.join(ROOT, 'userbot')]
+    sys.modules['userbot'] = package
+
+
+def timeit(func: Callable, number: int = 0, budget: float = 0.5) -> float:
+    """Return the average seconds per call of func.
+
+    Without a number of calls, func is called until the budget is used up.
+    """
+    calls = 0
+    start = time.perf_counter()
+    while True:
+        func()
+        calls += 1
+        elapsed = time.perf_counter() - start
+        if (number and calls >= number) or (not number and elapsed > budget):
+            return elapsed / calls
+
+
+def humanize(seconds: float) -> str:
+    for unit, scale in (('s', 1), ('ms', 1e-3), ('us', 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.1f}{unit}"
+    return f"{seconds / 1e-9:.0f}ns"
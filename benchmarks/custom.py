@@ -0,0 +1,176 @@
+# TG-UserBot - A modular Telegram UserBot script for Python.
+# Copyright (C) 2019  Kandarp <https://github.com/kandnub>
+#
+# TG-UserBot is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# TG-UserBot is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with TG-UserBot.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Benchmarks of userbot.utils.custom's message handling."""
+
+
+import asyncio
+import copy
+from typing import Tuple
+
+from common import humanize, timeit
+
+from telethon.client.messageparse import MessageParseMethods
+from telethon.extensions import markdown
+from telethon.tl import types
+
+from userbot.utils.custom import ParsedText, split_message
+
+
+MAXLIM = 4096
+
+
+# The splitter used by answer() before split_message
+async def _resolve_entities(message: str, entities: list) -> dict:
+    """Don't even bother trying to figure this mess out"""
+    messages = []
+    while entities:
+        end = 100 if len(entities) >= 100 else len(entities)
+        if len(message) > MAXLIM:
+            end, _ = min(
+                enumerate(entities[:end]),
+                key=lambda x: abs(x[1].offset + x[1].length - MAXLIM)
+            )
+            if end == 0:
+                msg_end = entities[0].offset + entities[0].length
+                if msg_end > MAXLIM:
+                    entity_type = getattr(types, type(entities[0]).__name__)
+                    kwargs = vars(entities[0])
+                    kwargs.update(offset=0)
+                    for i in range(0, msg_end, MAXLIM):
+                        end = i+MAXLIM if i+MAXLIM <= msg_end else msg_end
+                        m_chunk = message[i:end]
+                        kwargs.update(length=len(m_chunk))
+                        messages.append((m_chunk, [entity_type(**kwargs)]))
+                else:
+                    messages.append((message[:msg_end], [entities[0]]))
+                next_offset, _ = await _next_offset(1, entities)
+                del entities[0]
+                message = message[msg_end:]
+                await _reset_entities(entities, msg_end, next_offset)
+                continue
+            end = end + 1  # We don't want the index
+
+        _, last_chunk = await _next_offset(end, entities)
+        if not last_chunk:
+            last_end = entities[end+1].offset + entities[end+1].length
+            if end > 3 and not message[last_end:].startswith('\n'):
+                for e in entities[:end:-1]:
+                    start = e.offset + e.length
+                    end = end - 1
+                    if end == 2 or message[start:].startswith('\n'):
+                        break
+        e_chunk = entities[:end]
+        next_offset, last_chunk = await _next_offset(end, entities)
+        if last_chunk:
+            msg_end = len(message) + 1
+        else:
+            msg_end = e_chunk[-1].offset + e_chunk[-1].length
+        t_chunk = message[:msg_end]
+        messages.append((t_chunk, e_chunk))
+        entities = entities[end:]
+        message = message[len(t_chunk):]
+        if entities:
+            await _reset_entities(entities, msg_end, next_offset)
+    return messages
+
+
+async def _reset_entities(entities: list, end: int, next_offset: int) -> None:
+    """Reset the offset of entities's list which has been cut"""
+    offset = entities[0].offset
+    increment = 0 if next_offset == end else next_offset - end
+    for entity in entities:
+        entity.offset = entity.offset + increment - offset
+
+
+async def _next_offset(end, entities) -> Tuple[int, bool]:
+    """Find out how much length we need to skip ahead for the next entities"""
+    last_chunk = False
+    if len(entities) >= end+1:
+        next_offset = entities[end].offset
+    else:
+        # It's always the last entity so just grab the last index
+        next_offset = entities[-1].offset + entities[-1].length
+        last_chunk = True
+    return next_offset, last_chunk
+
+
+def eval_output(lines: int):
+    """Text with a bold entity on every line like a long .eval output"""
+    text = ''
+    entities = []
+    for i in range(lines):
+        line = f"result {i}: "
+        entities.append(types.MessageEntityBold(len(text) + len(line), 8))
+        text += line + "abcdefgh\n"
+    return text, entities
+
+
+def bench_split():
+    loop = asyncio.new_event_loop()
+    for lines in (500, 5000, 20000):
+        text, entities = eval_output(lines)
+        new = timeit(lambda: list(split_message(text, entities)))
+        old = timeit(
+            lambda: loop.run_until_complete(
+                _resolve_entities(text, copy.deepcopy(entities))
+            ),
+            1 if lines > 5000 else 0
+        )
+        print(
+            f"split {lines:>5} entities, {len(text)} characters: "
+            f"split_message {humanize(new)}, _resolve_entities {humanize(old)}"
+        )
+    loop.close()
+
+
+def markdown_output(lines: int) -> str:
+    """Markdown like a long .term output with some formatting per line"""
+    return '\n'.join(
+        f"**{i}:** `drwxr-xr-x` __root__ [file{i}](https://t.me/{i})"
+        for i in range(lines)
+    )
+
+
+def bench_parse():
+    """Parsing of answer() and Telethon before and after ParsedText"""
+    loop = asyncio.new_event_loop()
+    # _parse_message_text only needs the client for mentions
+    parse_message_text = MessageParseMethods._parse_message_text
+    for lines in (10, 100, 1000):
+        text = markdown_output(lines)
+
+        def old():
+            # answer() parsed to measure the text, then Telethon again
+            markdown.parse(text)
+            loop.run_until_complete(parse_message_text(None, text, 'md'))
+
+        def new():
+            msg, entities = markdown.parse(text)
+            loop.run_until_complete(
+                parse_message_text(None, msg, ParsedText(entities))
+            )
+
+        print(
+            f"parse {len(text):>6} characters: ParsedText "
+            f"{humanize(timeit(new))}, parsed twice {humanize(timeit(old))}"
+        )
+    loop.close()
+
+
+if __name__ == '__main__':
+    bench_split()
+    bench_parse()
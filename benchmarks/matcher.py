@@ -0,0 +1,76 @@
+# TG-UserBot - A modular Telegram UserBot script for Python.
+# Copyright (C) 2019  Kandarp <https://github.com/kandnub>
+#
+# TG-UserBot is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# TG-UserBot is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with TG-UserBot.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Compare the blacklist PatternMatcher with the old per-rule regex loop."""
+
+
+import random
+import re
+import string
+import time
+
+from common import humanize, timeit
+
+from userbot.helper_funcs.matcher import PatternMatcher
+
+
+def wildcard_string(value: str) -> str:
+    """Same as userbot.plugins.blacklist.wildcard_string"""
+    value = re.sub(r'(?<!\\)\*', '.+', value, count=0)
+    return re.sub(r'(?<!\\)\?', '.', value, count=0)
+
+
+def old_search(rules, text):
+    for value in rules:
+        if re.search(wildcard_string(value), text, flags=re.I):
+            return value
+    return None
+
+
+def make_rules(count: int, rnd: random.Random):
+    rules = []
+    for i in range(count):
+        length = rnd.randint(4, 12)
+        word = ''.join(rnd.choices(string.ascii_lowercase, k=length))
+        # Roughly one in ten rules has a wildcard
+        rules.append(word + '*' + str(i) if i % 10 == 0 else word)
+    return rules
+
+
+def main():
+    rnd = random.Random(0)
+    text = ' '.join(
+        ''.join(rnd.choices(string.digits, k=9)) for _ in range(30)
+    )
+    print(f"{len(text)} characters without a match")
+    for count in (10, 1000, 50000):
+        rules = make_rules(count, rnd)
+        matcher = PatternMatcher(rules, wildcard_string)
+        start = time.perf_counter()
+        matcher._compile()
+        compiled = time.perf_counter() - start
+        assert matcher.search(text) == old_search(rules, text)
+
+        new = timeit(lambda: matcher.search(text))
+        old = timeit(lambda: old_search(rules, text), 1 if count > 1000 else 0)
+        print(
+            f"{count:>6} rules: matcher {humanize(new)} per search, "
+            f"old loop {humanize(old)}, compile {humanize(compiled)}"
+        )
+
+
+if __name__ == '__main__':
+    main()
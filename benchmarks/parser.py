@@ -0,0 +1,69 @@
+# TG-UserBot - A modular Telegram UserBot script for Python.
+# Copyright (C) 2019  Kandarp <https://github.com/kandnub>
+#
+# TG-UserBot is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# TG-UserBot is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with TG-UserBot.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Compare the cached argument parser with the old asynchronous one."""
+
+
+import asyncio
+import os
+import sys
+
+from common import humanize, ROOT, timeit
+
+from userbot.utils.parser import _parse, parse
+
+sys.path.insert(0, os.path.join(ROOT, 'tests'))
+from test_parser import CORPUS, old_parse_arguments  # noqa: E402
+
+
+def main():
+    loop = asyncio.new_event_loop()
+    inputs = {
+        'corpus': CORPUS,
+        'bulk blacklist': [
+            'txt=[' + ', '.join(f'word{i}' for i in range(500)) + ']'
+        ],
+    }
+    for name, corpus in inputs.items():
+        async def old_all():
+            for arguments in corpus:
+                try:
+                    await old_parse_arguments(arguments)
+                except ValueError:
+                    pass
+
+        def old():
+            loop.run_until_complete(old_all())
+
+        def new(cached):
+            if not cached:
+                _parse.cache_clear()
+            for arguments in corpus:
+                try:
+                    parse(arguments)
+                except ValueError:
+                    pass
+
+        print(
+            f"{name}: old {humanize(timeit(old))}, "
+            f"compiled {humanize(timeit(lambda: new(False)))}, "
+            f"cached {humanize(timeit(lambda: new(True)))}"
+        )
+    loop.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+# TG-UserBot - A modular Telegram UserBot script for Python.
+# Copyright (C) 2019  Kandarp <https://github.com/kandnub>
+#
+# TG-UserBot is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# TG-UserBot is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with TG-UserBot.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Time NewMessage's command filtering per message against the command count.
+
+Every command has an edited twin, so each message is filtered by twice as
+many handlers as there are commands. Past 512 patterns the old loop also
+overflows re's compile cache and recompiles every pattern on each message.
+"""
+
+
+import itertools
+import random
+import re
+import string
+
+from common import humanize, timeit
+
+from userbot.utils.router import CommandRouter, DEFAULT_PREFIX
+
+
+TEMPLATES = [
+    r"{}(?: |$)(.*)$",
+    r"{}$",
+    r"(?:un|dis){}(?: |$)(.+)?$",
+    r"{}(?: |$|\n)([\s\S]*)",
+]
+
+
+class Builder:
+    def __init__(self, regex):
+        self.regex = (regex, 0)
+        self.disable_prefix = False
+
+
+def old_filter(builders, prefix, text):
+    prefix = re.escape(prefix) if prefix else DEFAULT_PREFIX
+    for builder in builders:
+        exp, flags = builder.regex
+        pattern = re.compile("(?i)^" + prefix + exp, flags=flags).finditer
+        list(pattern(text))
+
+
+def router_filter(router, builders, prefix, text):
+    for builder in builders:
+        router.match(builder, prefix, text)
+
+
+def make_builders(count, rnd):
+    builders = []
+    for i in range(count):
+        length = rnd.randint(3, 8)
+        name = ''.join(rnd.choices(string.ascii_lowercase, k=length))
+        regex = TEMPLATES[i % len(TEMPLATES)].format(name)
+        builders.extend((Builder(regex), Builder(regex)))
+    return builders
+
+
+def main():
+    rnd = random.Random(0)
+    messages = {
+        'chat message': "Sure, let's meet at 5 then!",
+        'command': ".ping",
+    }
+    for count in (10, 80, 500, 2000):
+        builders = make_builders(count, rnd)
+        router = CommandRouter()
+        for builder in builders:
+            router.add(builder)
+        router.rebuild('.')
+        for kind, text in messages.items():
+            # Every message has a different text
+            counter = itertools.count()
+            old = timeit(
+                lambda: old_filter(builders, '.', f"{text} {next(counter)}")
+            )
+            new = timeit(lambda: router_filter(
+                router, builders, '.', f"{text} {next(counter)}"
+            ))
+            print(
+                f"{count:>5} commands, {kind}: router {humanize(new)} "
+                f"per message, old loop {humanize(old)}"
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,212 @@
+# TG-UserBot - A modular Telegram UserBot script for Python.
+# Copyright (C) 2019  Kandarp <https://github.com/kandnub>
+#
+# TG-UserBot is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# TG-UserBot is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with TG-UserBot.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import asyncio
+import random
+
+import pytest
+
+from telethon.helpers import add_surrogate
+from telethon.tl import types
+
+from userbot.utils.custom import answer, recently_sent, split_message
+
+
+def random_message(rnd, size, count, max_length=200):
+    text = ''.join(
+        rnd.choice(['a', 'b', ' ', '\n', 'é', '😀']) for _ in range(size)
+    )
+    surrogates = add_surrogate(text)
+    # Telegram's entities never start or end inside of a surrogate pair
+    bounds = [
+        i for i in range(len(surrogates) + 1)
+        if not i or not '\ud800' <= surrogates[i - 1] <= '\udbff'
+    ]
+    entities = []
+    for i in range(count):
+        start = rnd.randrange(len(bounds) - 1)
+        end = rnd.randint(start + 1, min(start + max_length, len(bounds) - 1))
+        offset = bounds[start]
+        entities.append(
+            types.MessageEntityTextUrl(offset, bounds[end] - offset, str(i))
+        )
+    return text, entities
+
+
+def check_chunks(text, entities, chunks, limit=4096, max_entities=100):
+    """Check the limits and return the positions covered by each entity"""
+    assert ''.join(chunk for chunk, _ in chunks) == text
+    covered = {entity.url: set() for entity in entities}
+    start = 0
+    for chunk, chunk_entities in chunks:
+        size = len(add_surrogate(chunk))
+        assert 0 < size <= limit
+        assert len(chunk_entities) <= max_entities
+        for entity in chunk_entities:
+            assert entity.length > 0
+            assert entity.offset + entity.length <= size
+            offset = start + entity.offset
+            covered[entity.url].update(range(offset, offset + entity.length))
+        start += size
+    return covered
+
+
+def expected(entities):
+    return {
+        entity.url: set(range(entity.offset, entity.offset + entity.length))
+        for entity in entities
+    }
+
+
+def overlap(entities):
+    """The largest number of entities covering the same position"""
+    edges = sorted(
+        [(e.offset, 1) for e in entities] +
+        [(e.offset + e.length, -1) for e in entities]
+    )
+    depth = deepest = 0
+    for _, change in edges:
+        depth += change
+        deepest = max(deepest, depth)
+    return deepest
+
+
+def test_split_message_fuzz():
+    rnd = random.Random(0)
+    for _ in range(300):
+        limit = rnd.choice([16, 64, 4096])
+        max_entities = rnd.choice([3, 10, 100])
+        text, entities = random_message(
+            rnd, rnd.randint(1, 3 * limit), rnd.randint(0, 3 * max_entities),
+            max_length=limit // 2
+        )
+        chunks = list(split_message(text, entities, limit, max_entities))
+        covered = check_chunks(text, entities, chunks, limit, max_entities)
+        # Formatting is only dropped where too many entities overlap
+        if overlap(entities) < max_entities:
+            assert covered == expected(entities)
+    rnd = random.Random(1)
+    for _ in range(20):
+        text, entities = random_message(rnd, rnd.randint(5000, 20000), 400)
+        chunks = list(split_message(text, entities))
+        covered = check_chunks(text, entities, chunks)
+        assert covered == expected(entities)
+
+
+def test_split_message_keeps_the_input():
+    text, entities = random_message(random.Random(2), 9000, 300)
+    before = [(e.offset, e.length) for e in entities]
+    list(split_message(text, entities))
+    assert [(e.offset, e.length) for e in entities] == before
+
+
+def test_split_message_cuts_after_newlines():
+    text = ('x' * 3000 + '\n') * 3
+    chunks = [chunk for chunk, _ in split_message(text, [])]
+    assert chunks == ['x' * 3000 + '\n'] * 3
+
+
+def test_split_message_many_carried_entities():
+    text = 'a' * 10000
+    entities = [
+        types.MessageEntityTextUrl(i, 10000 - 2 * i, str(i))
+        for i in range(150)
+    ]
+    chunks = list(split_message(text, entities))
+    covered = check_chunks(text, entities, chunks)
+    # The outermost entities keep their formatting
+    wanted = expected(entities)
+    for i in range(100):
+        assert covered[str(i)] == wanted[str(i)]
+
+
+@pytest.fixture(autouse=True)
+def clear_recently_sent():
+    recently_sent.clear()
+
+
+class Client:
+    def __init__(self):
+        self.rpcs = []
+
+    async def get_messages(self, *args, **kwargs):
+        # answer() used to look the message up on every call
+        self.rpcs.append('get_messages')
+
+
+class Message:
+    def __init__(self, client, id=1, out=True, chat_id=10, **kwargs):
+        self.client = client
+        self.id = id
+        self.out = out
+        self.chat_id = chat_id
+        self.reply_to_msg_id = None
+        self.fwd_from = None
+        self.media = None
+        self.date = None
+        self.__dict__.update(kwargs)
+
+    async def respond(self, *args, **kwargs):
+        self.client.rpcs.append('respond')
+        return Message(self.client, self.id + 100, out=False)
+
+    async def edit(self, *args, **kwargs):
+        self.client.rpcs.append('edit')
+        return Message(self.client, self.id, out=False)
+
+
+def answer_all(message, *texts, **kwargs):
+    async def answers():
+        return [await answer(message, text, **kwargs) for text in texts]
+
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(answers())
+    finally:
+        loop.close()
+
+
+def test_answer_edits_outgoing_commands():
+    # .ping edits its message: 1 RPC, it was 2 with the get_messages call
+    client = Client()
+    answer_all(Message(client), "`Pong!`")
+    assert client.rpcs == ['edit']
+
+
+def test_answer_progress_edits():
+    # .dl edits the same message for every progress update
+    client = Client()
+    answer_all(Message(client), *(f"`{i}%`" for i in range(0, 100, 10)))
+    assert client.rpcs == ['edit'] * 10
+
+
+def test_answer_replies():
+    client = Client()
+    answer_all(Message(client), "`Done`", reply=True)
+    answer_all(Message(client, out=False), "`Hi`")
+    answer_all(
+        Message(client, media=types.MessageMediaPhoto()), "`Caption`"
+    )
+    assert client.rpcs == ['respond'] * 3
+
+
+def test_answer_edits_recently_sent_messages():
+    client = Client()
+    sent = answer_all(Message(client, out=False), "`Working...`")[0]
+    assert not sent.out
+    answer_all(sent, "`Still working...`", "`Done`")
+    assert client.rpcs == ['respond', 'edit', 'edit']
@@ -0,0 +1,83 @@
+# TG-UserBot - A modular Telegram UserBot script for Python.
+# Copyright (C) 2019  Kandarp <https://github.com/kandnub>
+#
+# TG-UserBot is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# TG-UserBot is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with TG-UserBot.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import asyncio
+import importlib.util
+import os
+
+from telethon.sessions import MemorySession
+from telethon.tl import types
+
+
+# Importing the userbot package would start the client
+FAST_TELETHON = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)),
+    'userbot', 'utils', 'FastTelethon.py'
+)
+spec = importlib.util.spec_from_file_location('FastTelethon', FAST_TELETHON)
+FastTelethon = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(FastTelethon)
+
+
+class Metrics:
+    def __init__(self):
+        self.lookups = []
+
+    def record_upload_cache(self, size, hit):
+        self.lookups.append(hit)
+
+    def record_transfer(self, direction, size, elapsed):
+        pass
+
+
+class Client:
+    def __init__(self, session):
+        self.session = session
+        self.metrics = Metrics()
+        self.loop = asyncio.get_event_loop()
+
+
+def test_upload_file_with_memory_session(tmp_path, monkeypatch):
+    path = tmp_path / 'file.bin'
+    path.write_bytes(b'userbot' * 100)
+    size = os.path.getsize(path)
+    uploaded = types.InputFile(1, 1, 'upload', '')
+
+    async def transfer(client, file, progress_callback, hash_md5):
+        return uploaded, size
+
+    async def upload(client):
+        with open(path, 'rb') as f:
+            return await FastTelethon.upload_file(client, f)
+
+    monkeypatch.setattr(
+        FastTelethon, '_internal_transfer_to_telegram', transfer
+    )
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        client = Client(MemorySession())
+        md5 = FastTelethon.md5sum(str(path)).digest()
+        # MemorySession.get_file builds the InputDocument without a reference
+        client.session.cache_file(
+            md5, size, types.InputDocument(2, 3, b'ref')
+        )
+        assert loop.run_until_complete(upload(client)) is uploaded
+        assert client.metrics.lookups == [False]
+    finally:
+        loop.close()
+        asyncio.set_event_loop(None)
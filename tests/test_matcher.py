@@ -0,0 +1,115 @@
+# TG-UserBot - A modular Telegram UserBot script for Python.
+# Copyright (C) 2019  Kandarp <https://github.com/kandnub>
+#
+# TG-UserBot is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# TG-UserBot is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with TG-UserBot.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import asyncio
+import random
+import re
+
+from userbot.helper_funcs.matcher import PatternMatcher
+
+
+def wildcard_string(value: str) -> str:
+    value = re.sub(r'(?<!\\)\*', '.+', value, count=0)
+    return re.sub(r'(?<!\\)\?', '.', value, count=0)
+
+
+def old_search(rules, text):
+    for value in rules:
+        if re.search(wildcard_string(value), text, flags=re.I):
+            return value
+    return None
+
+
+def test_reports_the_matched_rule():
+    matcher = PatternMatcher(
+        ['spam', 'sp*m', 'ba(r)', 'e?gs'], wildcard_string
+    )
+    assert matcher.search('SPAM here') == 'spam'
+    assert matcher.search('a sparrow swam') == 'sp*m'
+    assert matcher.search('bar') == 'ba(r)'
+    assert matcher.search('eggs') == 'e?gs'
+    assert matcher.search('nothing') is None
+
+
+def test_matches_like_the_old_loop():
+    rnd = random.Random(0)
+    rules = []
+    for i in range(300):
+        word = ''.join(rnd.choices('abc', k=rnd.randint(2, 5)))
+        rules.append(word + '*' + word[0] if i % 5 == 0 else word)
+    matcher = PatternMatcher(rules, wildcard_string)
+    for _ in range(300):
+        text = ''.join(rnd.choices('abcd ', k=rnd.randint(0, 12)))
+        found = matcher.search(text)
+        assert (found is None) == (old_search(rules, text) is None)
+        if found is not None:
+            assert re.search(wildcard_string(found), text, re.I)
+
+
+def test_incremental_changes():
+    matcher = PatternMatcher(['foo'])
+    matcher.add('bar')
+    assert matcher.search('a bar') == 'bar'
+    matcher.discard('foo')
+    assert matcher.search('foo') is None
+    assert len(matcher) == 1
+
+
+def test_invalid_patterns_dont_disable_the_list():
+    matcher = PatternMatcher(['[bad', 'x(?i)y', 'hello', 'wor.d'])
+    assert matcher.search('HELLO') == 'hello'
+    assert matcher.search('world') == 'wor.d'
+    assert matcher.search('xy') is None
+
+
+def test_concurrent_prepares_share_one_compile():
+    matcher = PatternMatcher(['foo', 'b.r'])
+    compiles = []
+    compile_ = matcher._compile
+
+    def counted():
+        compiles.append(matcher._version)
+        compile_()
+
+    matcher._compile = counted
+
+    async def prepare():
+        await asyncio.gather(*(matcher.prepare() for _ in range(20)))
+        matcher.add('baz')
+        await asyncio.gather(*(matcher.prepare() for _ in range(20)))
+
+    loop = asyncio.new_event_loop()
+    try:
+        loop.run_until_complete(prepare())
+    finally:
+        loop.close()
+    assert compiles == [0, 1]
+    assert matcher.search('baz') == 'baz'
+
+
+def test_changes_while_compiling_keep_it_dirty():
+    matcher = PatternMatcher(['a.b'])
+
+    def translate(pattern):
+        if pattern == 'a.b':
+            matcher.add('late')
+        return pattern
+
+    matcher.translate = translate
+    matcher._compile()
+    assert matcher._dirty
+    assert matcher.search('late') == 'late'
@@ -0,0 +1,148 @@
+# TG-UserBot - A modular Telegram UserBot script for Python.
+# Copyright (C) 2019  Kandarp <https://github.com/kandnub>
+#
+# TG-UserBot is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# TG-UserBot is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with TG-UserBot.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import asyncio
+import random
+import re
+
+from userbot.utils.parser import _parse, parse, parse_arguments
+
+
+KWARGS = re.compile(
+    r'(?<!\S)'  # Make sure the key starts after a whitespace
+    r'(?:(?P<q>\'|\")?)(?P<key>(?(q).+?|(?!\d)\w+?))(?(q)(?P=q))'
+    r'(?::(?!//)|=)\s?'
+    r'(?P<val>\[.+?\]|(?P<q1>\'|\").+?(?P=q1)|\S+)'
+)
+ARGS = re.compile(r'(?:(?P<q>\'|\"))(.+?)(?:(?P=q))')
+BOOL_MAP = {
+    'false': False,
+    'true': True,
+}
+CORPUS = [
+    '',
+    'https://youtu.be/dQw4w9WgXcQ format=mp3',
+    'https://youtu.be/a https://youtu.be/b fmt=listformats',
+    'url1 url2 round=true stream: false',
+    'txt=[spam, eggs, "ham"] url: [t.me/*, bit.ly/*]',
+    '"quoted arg" \'single quoted\' rest of it',
+    'tgid=[123, -456, 7.5] bio="my bio: links"',
+    "'key with spaces': value other=1",
+    'id=-1001234567890 reason=spam 42 3.14 -7',
+    'a, b, c,',
+    'list=[] empty=[,] nested=[[1, 2], 3]',
+    'time=1h30m silent=True force=FALSE',
+    'http://example.com:8080/path key:value',
+    '1e3 nan inf -inf 0x10 1_000',
+    '[1, 2, 3]\n[a b]\ttab',
+    'unicode=héllo 日本 emoji=😀',
+    'trailing\\, comma, escaped\\,',
+    'k1=v1 k1=v2',
+]
+
+
+async def _parse_arg(val):
+    """The asynchronous parser before it was compiled and cached"""
+    val = val.strip()
+
+    if re.match(r'-?\d+', val):
+        return int(val)
+
+    try:
+        return float(val)
+    except ValueError:
+        pass
+
+    if isinstance(val, str):
+        if re.search(r'^\[.*\]$', val):
+            val = re.sub(r'[\[\]]', '', val).split(',')
+            val = [await _parse_arg(v.strip()) for v in val]
+        else:
+            val = BOOL_MAP.get(val.lower(), val)
+    if isinstance(val, str):
+        val = re.sub(r'(?<!\\), ?$', '', val)
+    return val
+
+
+async def old_parse_arguments(arguments):
+    keyword_args = {}
+    args = []
+
+    for match in KWARGS.finditer(arguments):
+        key = match.group('key')
+        val = await _parse_arg(re.sub(r'[\'\"]', '', match.group('val')))
+        keyword_args.update({key: val})
+    arguments = KWARGS.sub('', arguments)
+
+    for val in ARGS.finditer(arguments):
+        args.append(await _parse_arg(val.group(2)))
+    arguments = ARGS.sub('', arguments)
+
+    for val in re.findall(r'([^\r\n\t\f\v ,]+|\[.*\])', arguments):
+        parsed = await _parse_arg(val)
+        if parsed:
+            args.append(parsed)
+    return args, keyword_args
+
+
+def fuzz_corpus(count):
+    rnd = random.Random(0)
+    tokens = [
+        'a', 'key', 'k2', '=', ':', ' ', ' ', ',', '[', ']', '"', "'", '1',
+        '-2', '3.5', 'true', 'False', 'http://x.y/z', '*', '\\,', '\n'
+    ]
+    for _ in range(count):
+        yield ''.join(rnd.choices(tokens, k=rnd.randint(1, 20)))
+
+
+def outcome(func, *args):
+    """The repr of the result or the type of the error, e.g. for int('1.5')"""
+    try:
+        result = func(*args)
+        if asyncio.iscoroutine(result):
+            loop = asyncio.new_event_loop()
+            try:
+                result = loop.run_until_complete(result)
+            finally:
+                loop.close()
+    except Exception as e:
+        return type(e)
+    return repr(result)
+
+
+def test_same_results_as_the_old_parser():
+    for arguments in CORPUS + list(fuzz_corpus(3000)):
+        expected = outcome(old_parse_arguments, arguments)
+        assert outcome(parse, arguments) == expected, arguments
+        # The second call is served by the cache
+        assert outcome(parse, arguments) == expected, arguments
+        assert outcome(parse_arguments, None, arguments) == expected
+
+
+def test_mutating_the_results_doesnt_change_the_cache():
+    _parse.cache_clear()
+    arguments = 'x y txt=[spam, eggs] url=[a, b]'
+    args, kwargs = parse(arguments)
+    args.append('z')
+    kwargs['txt'].append('ham')
+    kwargs['url'].clear()
+    kwargs['new'] = True
+    assert _parse.cache_info().currsize == 1
+    assert parse(arguments) == (
+        ['x', 'y'], {'txt': ['spam', 'eggs'], 'url': ['a', 'b']}
+    )
+    assert _parse.cache_info().hits == 1
@@ -0,0 +1,139 @@
+# TG-UserBot - A modular Telegram UserBot script for Python.
+# Copyright (C) 2019  Kandarp <https://github.com/kandnub>
+#
+# TG-UserBot is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# TG-UserBot is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with TG-UserBot.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import ast
+import glob
+import os
+import random
+import re
+
+from userbot.utils.router import CommandRouter, DEFAULT_PREFIX, first_chars
+
+
+PLUGINS = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), 'userbot', 'plugins'
+)
+
+
+class Builder:
+    def __init__(self, regex, disable_prefix=False):
+        self.regex = regex if isinstance(regex, tuple) else (regex, 0)
+        self.disable_prefix = disable_prefix
+
+
+def old_match(builder, prefix, text):
+    """The per-handler loop of NewMessage.filter before the router"""
+    prefix = re.escape(prefix) if prefix else DEFAULT_PREFIX
+    exp, flags = builder.regex
+    if not builder.disable_prefix:
+        pattern = re.compile("(?i)^" + prefix + exp, flags=flags).finditer
+    else:
+        pattern = re.compile(exp, flags=flags).finditer
+    return list(pattern(text)) or None
+
+
+def plugin_builders():
+    """The builders of the plugins' commands with a literal regex"""
+    builders = []
+    for path in sorted(glob.glob(os.path.join(PLUGINS, '*.py'))):
+        with open(path, encoding='utf-8') as f:
+            tree = ast.parse(f.read())
+        names = {
+            node.targets[0].id: node.value.value
+            for node in tree.body
+            if isinstance(node, ast.Assign)
+            and isinstance(node.targets[0], ast.Name)
+            and isinstance(node.value, ast.Constant)
+            and isinstance(node.value.value, str)
+        }
+        for node in ast.walk(tree):
+            if not isinstance(node, ast.Call):
+                continue
+            kwargs = {k.arg: k.value for k in node.keywords if k.arg}
+            regex = kwargs.get('regex', None)
+            if isinstance(regex, ast.Tuple):
+                exp = regex.elts[0]
+                flags = eval(compile(
+                    ast.Expression(regex.elts[1]), path, 'eval'
+                ), {'re': re})
+            else:
+                exp, flags = regex, 0
+            if isinstance(exp, ast.Name):
+                exp = names.get(exp.id, None)
+            elif isinstance(exp, ast.Constant):
+                exp = exp.value
+            else:
+                continue
+            if not isinstance(exp, str):
+                continue
+            disable_prefix = kwargs.get('disable_prefix', None)
+            builders.append(Builder(
+                (exp, flags),
+                isinstance(disable_prefix, ast.Constant)
+                and disable_prefix.value
+            ))
+    return builders
+
+
+def groups(matches):
+    if matches is None:
+        return None
+    return [(m.span(), m.groups()) for m in matches]
+
+
+def texts(builders, rnd):
+    words = ['ping', 'eval 1+1', 'dl', 'download x', 'ban @user', 'sed',
+             's/a/b/', 'resetprefix', 'help', 'term\nls', '', 'ÄBC', ' ']
+    for builder in builders:
+        exp = builder.regex[0]
+        words.append(re.sub(r'[^a-z ]', '', exp.split('(')[0]) or exp[:4])
+    for _ in range(2000):
+        prefix = rnd.choice(['.', '!', '/', '#', 'x', '', '-', '.s', '..'])
+        word = rnd.choice(words)
+        if rnd.random() < 0.3:
+            word = word.upper()
+        suffix = rnd.choice(['', ' arg', '\nline', ' 1 2', '$'])
+        yield prefix + word + suffix
+
+
+def test_plugin_commands_are_found():
+    builders = plugin_builders()
+    assert len(builders) > 50
+
+
+def test_router_matches_like_the_old_loop():
+    builders = plugin_builders()
+    router = CommandRouter()
+    for builder in builders:
+        router.add(builder)
+    rnd = random.Random(0)
+    for prefix in (None, '.', '!!', 'x'):
+        for text in texts(builders, rnd):
+            for builder in builders:
+                assert groups(router.match(builder, prefix, text)) == groups(
+                    old_match(builder, prefix, text)
+                ), (prefix, text, builder.regex)
+
+
+def test_first_chars():
+    assert first_chars('ping$') == {'p'}
+    assert first_chars(r'd(own)?l(oad)?') == {'d'}
+    assert first_chars(r'(?:un|dis)approve') == {'u', 'd'}
+    assert first_chars(r'[A-C]x') == {'a', 'b', 'c'}
+    assert first_chars(r'(a)?b') == {'a', 'b'}
+    assert first_chars(r'.+') is None
+    assert first_chars(r'x*') is None
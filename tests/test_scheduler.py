@@ -0,0 +1,84 @@
+# TG-UserBot - A modular Telegram UserBot script for Python.
+# Copyright (C) 2019  Kandarp <https://github.com/kandnub>
+#
+# TG-UserBot is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# TG-UserBot is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with TG-UserBot.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import asyncio
+
+from telethon import errors, TelegramClient
+from telethon.tl import functions, types
+
+from userbot.utils.client import UserBotClient
+from userbot.utils.scheduler import RequestScheduler
+
+
+def make_client(monkeypatch, floods):
+    """A client whose Telethon _call raises the given FloodWaits first"""
+    calls = []
+
+    async def _call(self, sender, request, ordered=False):
+        calls.append(sender)
+        if floods:
+            raise errors.FloodWaitError(request=request, capture=floods.pop())
+        return 'result'
+
+    monkeypatch.setattr(TelegramClient, '_call', _call, raising=False)
+    # Only the scheduling is needed, don't set up a connection
+    client = UserBotClient.__new__(UserBotClient)
+    client.scheduler = RequestScheduler(client)
+    client._sender = 'main'
+    return client, calls
+
+
+def run(coro):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.close()
+
+
+def request():
+    return functions.upload.GetFileRequest(
+        types.InputDocumentFileLocation(1, 2, b'', ''), 0, 1024
+    )
+
+
+def test_other_senders_are_paced(monkeypatch):
+    client, calls = make_client(monkeypatch, [0])
+    assert run(client._call('exported', request())) == 'result'
+    assert calls == ['exported', 'exported']
+    assert client.scheduler.stats['retried'] == 1
+
+
+def test_scheduled_requests_arent_paced_twice(monkeypatch):
+    client, calls = make_client(monkeypatch, [0])
+
+    acquired = []
+    acquire = client.scheduler._acquire
+
+    async def counted(keys):
+        acquired.append(keys)
+        await acquire(keys)
+
+    async def sender(request):
+        return await client._call(client._sender, request)
+
+    client.scheduler._acquire = counted
+    assert run(client.scheduler.call(sender, request())) == 'result'
+    assert calls == ['main', 'main']
+    # Only the outer call waited for the buckets and retried
+    assert len(acquired) == 2
+    assert client.scheduler.stats['retried'] == 1
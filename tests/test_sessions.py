@@ -0,0 +1,155 @@
+# TG-UserBot - A modular Telegram UserBot script for Python.
+# Copyright (C) 2019  Kandarp <https://github.com/kandnub>
+#
+# TG-UserBot is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# TG-UserBot is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with TG-UserBot.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import threading
+
+import redis
+from telethon.tl import types
+
+from userbot.utils.sessions import RedisSession
+
+
+class Pipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    def hset(self, *args):
+        self.commands.append(('hset', args))
+
+    def hdel(self, *args):
+        self.commands.append(('hdel', args))
+
+    def execute(self):
+        for command, args in self.commands:
+            getattr(self.redis, command)(*args)
+
+
+class FakeRedis(redis.Redis):
+    """The hash commands the session uses, in memory"""
+    def __init__(self):
+        self.hashes = {}
+        self.calls = []
+
+    def _call(self, name):
+        self.calls.append((name, threading.current_thread()))
+
+    def keys(self, pattern):
+        return []
+
+    def pipeline(self, transaction=True):
+        return Pipeline(self)
+
+    def hset(self, name, key, value):
+        self._call('hset')
+        self.hashes.setdefault(name, {})[str(key).encode()] = (
+            str(value).encode()
+        )
+
+    def hdel(self, name, key):
+        self._call('hdel')
+        self.hashes.get(name, {}).pop(str(key).encode(), None)
+
+    def hget(self, name, key):
+        self._call('hget')
+        return self.hashes.get(name, {}).get(str(key).encode(), None)
+
+    def hmget(self, name, keys):
+        self._call('hmget')
+        values = self.hashes.get(name, {})
+        return [values.get(str(key).encode(), None) for key in keys]
+
+
+def user(username, access_hash=77):
+    return types.User(
+        id=5, access_hash=access_hash, username=username, phone='123',
+        first_name='Name'
+    )
+
+
+def test_stale_indexes_are_removed_after_a_restart():
+    connection = FakeRedis()
+    session = RedisSession('test', connection)
+    session.process_entities([user('Old')])
+    session.close()
+    usernames = connection.hashes[session.index_keys['username']]
+    assert list(usernames) == [b'old']
+
+    restarted = RedisSession('test', connection)
+    assert restarted.get_entity_rows_by_username('old') == (5, 77)
+    restarted.process_entities([user('new')])
+    restarted.close()
+    assert list(usernames) == [b'new']
+    assert restarted.get_entity_rows_by_username('old') is None
+    assert restarted.get_entity_rows_by_username('new') == (5, 77)
+
+    # Not cached in the LRU, the stored row is read by the writer
+    third = RedisSession('test', connection)
+    third.process_entities([user('newer')])
+    third.close()
+    assert list(usernames) == [b'newer']
+
+
+def test_stale_cached_index_entries_are_ignored():
+    connection = FakeRedis()
+    session = RedisSession('test', connection)
+    session.process_entities([user('old')])
+    session.close()
+    restarted = RedisSession('test', connection)
+    assert restarted.get_entity_rows_by_username('old') == (5, 77)
+    # Another process changed the username
+    other = RedisSession('test', connection)
+    other.process_entities([user('new')])
+    other.close()
+    restarted._entity_rows.clear()
+    assert restarted.get_entity_rows_by_username('old') is None
+
+
+def test_unknown_entities_are_cached():
+    connection = FakeRedis()
+    session = RedisSession('test', connection)
+    for _ in range(3):
+        assert session.get_entity_rows_by_id(999) is None
+        assert session.get_entity_rows_by_username('nobody') is None
+    assert [name for name, _ in connection.calls] == ['hmget', 'hget']
+
+    session.process_entities([user('nobody')])
+    assert session.get_entity_rows_by_id(5) == (5, 77)
+    assert session.get_entity_rows_by_username('nobody') == (5, 77)
+
+
+def test_entities_are_written_by_the_writer_thread():
+    connection = FakeRedis()
+    session = RedisSession('test', connection)
+    session.process_entities([user('someone')])
+    session.process_entities([user('someone', access_hash=78)])
+    session.close()
+    assert connection.calls
+    assert all(
+        thread is not threading.current_thread()
+        for _, thread in connection.calls
+    )
+    assert RedisSession('test', connection).get_entity_rows_by_id(5) == (
+        5, 78
+    )
+
+
+def test_plain_hashes_of_older_sessions():
+    connection = FakeRedis()
+    session = RedisSession('test', connection)
+    connection.hset(session.entities_key, 9, 42)
+    assert session.get_entity_rows_by_id(9) == (9, 42)
@@ -0,0 +1,82 @@
+# TG-UserBot - A modular Telegram UserBot script for Python.
+# Copyright (C) 2019  Kandarp <https://github.com/kandnub>
+#
+# TG-UserBot is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# TG-UserBot is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with TG-UserBot.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import asyncio
+
+from telethon.tl import functions, types
+
+from userbot.utils.singleflight import SingleFlight
+
+
+class Client:
+    def __init__(self, loop):
+        self.loop = loop
+
+    async def get_input_entity(self, peer):
+        return types.InputPeerUser(peer, 7)
+
+
+def run(test):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(test(SingleFlight(Client(loop))))
+    finally:
+        loop.close()
+
+
+def test_concurrent_requests_share_one_call():
+    sent = []
+
+    async def sender(request):
+        sent.append(request)
+        await asyncio.sleep(0)
+        return len(sent)
+
+    async def test(singleflight):
+        return await asyncio.gather(*(
+            singleflight.call(
+                sender, functions.users.GetFullUserRequest(5)
+            ) for _ in range(5)
+        ))
+
+    assert run(test) == [1] * 5
+    assert len(sent) == 1
+
+
+def test_resolved_usernames_are_cached():
+    sent = []
+
+    async def sender(request):
+        sent.append(request)
+        return len(sent)
+
+    async def test(singleflight):
+        results = []
+        for username in ('someone', 'someone', 'other'):
+            results.append(await singleflight.call(
+                sender, functions.contacts.ResolveUsernameRequest(username)
+            ))
+        # Not opted in, only concurrent calls are shared
+        for _ in range(2):
+            results.append(await singleflight.call(
+                sender, functions.users.GetFullUserRequest(5)
+            ))
+        return results, singleflight.stats
+
+    results, stats = run(test)
+    assert results == [1, 1, 2, 3, 4]
+    assert stats['cached'] == 1
@@ -24,6 +24,7 @@ from telethon.errors import AuthKeyError, InvalidBufferError
 import userbot
 from userbot import client
 from .utils import helpers, log_formatter, pluginManager
+from .utils.exporter import MetricsExporter
 
 
 handler = logging.StreamHandler()
@@ -78,6 +79,10 @@ if __name__ == "__main__":
     )
     helpers.printVersion(client.version, client.prefix)
     client.loop.create_task(helpers.isRestart(client))
+    client.self_destructs.start()
+    client.metrics.start()
+    client.watchdog.start()
+    client.loop.run_until_complete(MetricsExporter(client).start())
 
     try:
         if sys.platform.startswith('win'):
@@ -94,4 +99,6 @@ if __name__ == "__main__":
         client._kill_running_processes()
         pass
     finally:
+        if client.is_connected():
+            client.loop.run_until_complete(client.log_sink.flush())
         client.disconnect()
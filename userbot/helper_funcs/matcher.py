@@ -0,0 +1,195 @@
+# TG-UserBot - A modular Telegram UserBot script for Python.
+# Copyright (C) 2019  Kandarp <https://github.com/kandnub>
+#
+# TG-UserBot is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# TG-UserBot is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with TG-UserBot.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import asyncio
+import logging
+import re
+from typing import Callable, Dict, Iterable, List, Optional, Pattern, Tuple
+
+
+LOGGER = logging.getLogger(__name__)
+SPECIAL_CHARS = frozenset('.^$*+?{}[]\\|()')
+
+
+class PatternMatcher:
+    """Search a text for many patterns at once with one compiled regex.
+
+    Literal patterns are merged into a trie shaped alternation so the regex
+    engine walks them like an automaton, the others are alternated without
+    groups since every group slows each branch down. Patterns can be added
+    and removed cheaply, the regex is rebuilt by ``prepare`` in an executor
+    or lazily by the next search.
+    """
+    def __init__(
+        self,
+        patterns: Iterable[str] = (),
+        translate: Callable[[str], str] = None,
+        flags: int = re.I
+    ):
+        self.translate = translate
+        self.flags = flags
+        self.patterns: Dict[str, None] = dict.fromkeys(patterns)
+        self._regex: Optional[Pattern] = None
+        self._literals: Dict[str, str] = {}
+        self._alternated: List[Tuple[Pattern, str]] = []
+        self._others: List[Tuple[Pattern, str]] = []
+        self._dirty = True
+        self._version = 0
+        self._compiling: Optional[asyncio.Future] = None
+
+    def add(self, *patterns: str) -> None:
+        for pattern in patterns:
+            if pattern not in self.patterns:
+                self.patterns[pattern] = None
+                self._changed()
+
+    def discard(self, *patterns: str) -> None:
+        for pattern in patterns:
+            if pattern in self.patterns:
+                del self.patterns[pattern]
+                self._changed()
+
+    def _changed(self) -> None:
+        self._version += 1
+        self._dirty = True
+
+    async def prepare(self) -> None:
+        """Rebuild the regex in an executor if the patterns changed.
+
+        Concurrent callers wait for the compile which is already running
+        and another one is only started if the patterns changed meanwhile.
+        """
+        while self._dirty:
+            if self._compiling is None or self._compiling.done():
+                loop = asyncio.get_event_loop()
+                self._compiling = loop.run_in_executor(None, self._compile)
+            await asyncio.shield(self._compiling)
+
+    def search(self, text: str) -> Optional[str]:
+        """Return the pattern which matched the text first, if any."""
+        if not text or not self.patterns:
+            return None
+        if self._dirty:
+            self._compile()
+
+        if self._regex:
+            match = self._regex.search(text)
+            if match:
+                if match.lastgroup == 'literal':
+                    return self._literal(match.group())
+                # The first alternative which matches where the match starts
+                for regex, pattern in self._alternated:
+                    if regex.match(text, match.start()):
+                        return pattern
+        for regex, pattern in self._others:
+            if regex.search(text):
+                return pattern
+        return None
+
+    def _literal(self, matched: str) -> str:
+        pattern = self._literals.get(matched.lower(), None)
+        if pattern is None:
+            # Case folding which isn't covered by str.lower
+            for key, value in self._literals.items():
+                if re.fullmatch(re.escape(key), matched, self.flags):
+                    return value
+        return pattern
+
+    def _compile(self) -> None:
+        version = self._version
+        literals: Dict[str, str] = {}
+        alternated: List[Tuple[Pattern, str]] = []
+        others: List[Tuple[Pattern, str]] = []
+        alternatives = []
+
+        for pattern in list(self.patterns):
+            regex = self.translate(pattern) if self.translate else pattern
+            if not SPECIAL_CHARS.intersection(regex):
+                literals.setdefault(regex.lower(), pattern)
+                continue
+            try:
+                compiled = re.compile(regex, self.flags)
+            except re.error as e:
+                LOGGER.warning("Skipping the invalid pattern %r: %s", regex, e)
+                continue
+            if compiled.groups:
+                # Group numbers and backreferences would shift if merged
+                others.append((compiled, pattern))
+            else:
+                alternated.append((compiled, pattern))
+                alternatives.append(f"(?:{regex})")
+
+        if literals:
+            alternatives.insert(0, f"(?P<literal>{_trie_regex(literals)})")
+        try:
+            regex = (
+                re.compile('|'.join(alternatives), self.flags)
+                if alternatives else None
+            )
+        except re.error as e:
+            # Some patterns, e.g. with inline global flags, only compile alone
+            LOGGER.warning("Couldn't merge the patterns: %s", e)
+            regex = (
+                re.compile(alternatives[0], self.flags)
+                if literals else None
+            )
+            others = alternated + others
+            alternated = []
+
+        # Swap everything in at once, searches never see a partial state
+        self._regex, self._literals, self._alternated, self._others = (
+            regex, literals, alternated, others
+        )
+        # Patterns changed while compiling need another pass
+        self._dirty = self._version != version
+
+    def __len__(self) -> int:
+        return len(self.patterns)
+
+
+def _trie_regex(words: Iterable[str]) -> str:
+    """Build a regex which matches any of the words, sharing prefixes.
+
+    The words mustn't contain any of the regex special characters.
+    """
+    trie: dict = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = None
+    return _node_regex(trie)
+
+
+def _node_regex(node: dict) -> str:
+    optional = '' in node
+    branches = []
+    # Iterate instead of recursing for chains of single children
+    for char in sorted(c for c in node if c):
+        child = node[char]
+        prefix = char
+        while len(child) == 1 and '' not in child:
+            (char, child), = child.items()
+            prefix += char
+        branches.append(prefix + _node_regex(child) if child else prefix)
+
+    if not branches:
+        return ''
+    if len(branches) == 1 and not optional:
+        return branches[0]
+    regex = '(?:' + '|'.join(branches) + ')'
+    return regex + '?' if optional else regex
@@ -16,7 +16,6 @@
 
 
 import concurrent
-import datetime
 import functools
 import os
 import pathlib
@@ -25,6 +24,7 @@ import time
 import youtube_dl
 
 from .. import LOGGER
+from ..utils.editor import EditScheduler
 
 
 downloads = {}
@@ -68,34 +68,18 @@ class ProgressHook():
     """Custom hook with the event stored for YTDL."""
     def __init__(self, event):
         self.event = event
-        self.last_edit = None
-        self.tasks = []
+        self.editor = EditScheduler.get(event)
 
-    def callback(self, task):
-        """Cancel pending tasks else skip them if completed."""
-        if task.cancelled():
-            return
-        else:
-            new = task.result().date
-            if new > self.last_edit:
-                self.last_edit = new
-
-    def edit(self, *args, **kwargs):
-        """Create a Task of the progress edit."""
-        task = self.event.client.loop.create_task(
-            self.event.answer(*args, **kwargs)
+    def edit(self, *args, **kwargs) -> None:
+        """Schedule a progress edit from YoutubeDL's thread."""
+        self.event.client.loop.call_soon_threadsafe(
+            functools.partial(self.editor.edit, *args, **kwargs)
         )
-        task.add_done_callback(self.callback)
-        self.tasks.append(task)
-        return task
 
     def hook(self, d: dict) -> None:
         """
             YoutubeDL's hook which logs progress and errors to UserBot logger.
         """
-        if not self.last_edit:
-            self.last_edit = datetime.datetime.now(datetime.timezone.utc)
-        now = datetime.datetime.now(datetime.timezone.utc)
         if d['status'] == 'downloading':
             filen = d.get('filename', 'Unknown filename')
             prcnt = d.get('_percent_str', None)
@@ -112,16 +96,12 @@ class ProgressHook():
                 )
             )
             LOGGER.debug(finalStr)
-            if (
-                not self.last_edit or
-                (now - self.last_edit).total_seconds() > 5
-            ):
-                filen = re.sub(r'YT_DL\\(.+)_\d+\.', r'\1.', filen)
-                self.edit(
-                    f"`Downloading {filen} at {spdstr}.`\n"
-                    f"__Progress: {prcnt} of {ttlbyt}__\n"
-                    f"__ETA: {etastr}__"
-                )
+            filen = re.sub(r'YT_DL\\(.+)_\d+\.', r'\1.', filen)
+            self.edit(
+                f"`Downloading {filen} at {spdstr}.`\n"
+                f"__Progress: {prcnt} of {ttlbyt}__\n"
+                f"__ETA: {etastr}__"
+            )
 
         elif d['status'] == 'finished':
             filen = d.get('filename', 'Unknown filename')
@@ -135,15 +115,7 @@ class ProgressHook():
 
             finalStr = f"Downloaded {filen}: 100% of {ttlbyt} in {elpstr}"
             LOGGER.warning(finalStr)
-            self.event.client.loop.create_task(
-                self.event.answer(
-                    f"`Successfully downloaded {filen1} in {elpstr}!`"
-                )
-            )
-            for task in self.tasks:
-                if not task.done():
-                    task.cancel()
-            self.tasks.clear()
+            self.edit(f"`Successfully downloaded {filen1} in {elpstr}!`")
 
         elif d['status'] == 'error':
             finalStr = "Error: " + str(d)
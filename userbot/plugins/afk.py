@@ -25,6 +25,7 @@ from typing import Tuple
 
 from userbot import client
 from userbot.plugins import plugins_data
+from userbot.utils.context import UpdateContext
 from userbot.utils.helpers import _humanfriendly_seconds, get_chat_link
 from userbot.utils.events import NewMessage
 
@@ -59,7 +60,10 @@ async def awayfromkeyboard(event: NewMessage.Event) -> None:
     raise StopPropagation
 
 
-@client.onMessage(outgoing=True, forwards=None)
+@client.onMessage(
+    outgoing=True, forwards=None,
+    condition=lambda e: os.environ.get('userbot_afk', False)
+)
 async def out_listner(event: NewMessage.Event) -> None:
     """Handle your AFK status by listening to new outgoing messages."""
     if event.from_scheduled or not os.environ.pop('userbot_afk', False):
@@ -131,10 +135,16 @@ async def out_listner(event: NewMessage.Event) -> None:
     AFK.sent.clear()
 
 
-@client.onMessage(incoming=True, edited=False)
+@client.onMessage(
+    incoming=True, edited=False,
+    condition=lambda e: (
+        os.environ.get('userbot_afk', False) and (e.is_private or e.mentioned)
+    )
+)
 async def inc_listner(event: NewMessage.Event) -> None:
     """Handle tags and new messages by listening to new incoming messages."""
-    sender = await event.get_sender()
+    context = UpdateContext.get(event)
+    sender = await context.get_sender()
     if event.from_scheduled or (isinstance(sender, types.User) and sender.bot):
         return
 
@@ -153,7 +163,7 @@ async def inc_listner(event: NewMessage.Event) -> None:
         ' because ' + reason if reason else '', elapsed
     )
 
-    chat = await event.get_chat()
+    chat = await context.get_chat()
     if event.is_private:
         await _append_msg(AFK.privates, chat.id, event.id)
     else:
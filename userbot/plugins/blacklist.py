@@ -15,15 +15,22 @@
 # along with TG-UserBot.  If not, see <https://www.gnu.org/licenses/>.
 
 
+import asyncio
 import dill
+import io
+import json
 import re
-from typing import Dict, List, Tuple, Union
+from typing import Dict, Iterable, List, Set, Tuple, Union
 
+from telethon import errors
 from telethon.events import ChatAction
 from telethon.tl import types, functions
 from telethon.utils import get_display_name, resolve_invite_link
 
 from userbot import client, LOGGER
+from userbot.helper_funcs.matcher import PatternMatcher
+from userbot.utils.cache import LRUCache
+from userbot.utils.context import UpdateContext
 from userbot.utils.events import NewMessage
 from userbot.utils.sessions import RedisSession
 from userbot.plugins.plugins_data import Blacklist, GlobalBlacklist
@@ -84,6 +91,7 @@ bld_pattern = (
     r"(?: |$)"
     r"(?:(?P<option>\w+))?"
 )
+ie_pattern = r"(?P<action>ex|im)portlists$"
 id_pattern = re.compile(
     r'(?:https?:\/\/)?(?:www\.)?(?:t\.me\/)?@?(?P<e>\w{5,35}|-?\d{6,16})\/?'
 )
@@ -105,60 +113,103 @@ full_key_names = {
     'url': '[URLs]'
 }
 
-temp_banlist: List[int] = []
+temp_banlist: Set[int] = set()
 localBlacklists: Dict[int, Blacklist] = {}
 blacklistedUsers: Dict[int, Tuple[str, Union[str, int]]] = {}
-whitelistedUsers: List[int] = []
-whitelistedChats: List[int] = []
+whitelistedUsers: Set[int] = set()
+whitelistedChats: Set[int] = set()
+matchers: Dict[Tuple[Union[str, int], str], PatternMatcher] = {}
+IMPORT_CHUNK: int = 10000
+BIO_TTL: int = 600
+BIO_CONCURRENCY: int = 5
+# Users joining several chats only have their bio fetched once per TTL
+bios = LRUCache(maxsize=10000, ttl=BIO_TTL)
+bio_tasks: Dict[int, asyncio.Task] = {}
+bio_semaphore = asyncio.Semaphore(BIO_CONCURRENCY)
+PEER_TTL: int = 3600
+UNRESOLVED_TTL: int = 300
+# Mentioned usernames -> peer IDs, None if they couldn't be resolved
+peer_ids = LRUCache(maxsize=4096, ttl=PEER_TTL)
+peer_tasks: Dict[Union[str, int], asyncio.Task] = {}
+
+
+def migrate_dill_blobs() -> None:
+    """Convert the old dill pickled blobs to native Redis sets and hashes"""
+    for key in redis.scan_iter('blacklists:*'):
+        if redis.type(key) != b'string':
+            continue
+        data = dill.loads(redis.get(key))
+        pipe = redis.pipeline()
+        pipe.delete(key)
+        for option, values in data.items():
+            if values:
+                pipe.sadd(f"{key.decode()}:{option}", *values)
+        pipe.execute()
+        LOGGER.info("Migrated %s to Redis sets.", key.decode())
+
+    if redis.type('blacklist:users') == b'string':
+        data = dill.loads(redis.get('blacklist:users'))
+        pipe = redis.pipeline()
+        pipe.delete('blacklist:users')
+        if data:
+            pipe.hset('blacklist:users', mapping={
+                user: json.dumps(ban) for user, ban in data.items()
+            })
+        pipe.execute()
+        LOGGER.info("Migrated blacklist:users to a Redis hash.")
+
+    for key in ('whitelist:users', 'whitelist:chats'):
+        if redis.type(key) == b'string':
+            data = dill.loads(redis.get(key))
+            pipe = redis.pipeline()
+            pipe.delete(key)
+            if data:
+                pipe.sadd(key, *data)
+            pipe.execute()
+            LOGGER.info("Migrated %s to a Redis set.", key)
+
+
+def decode_value(option: str, value: bytes) -> Union[str, int]:
+    """Decode a member of a blacklist option's Redis set"""
+    return int(value) if option == 'tgid' else value.decode()
+
 
 if redis:
-    local_keys = redis.keys('blacklists:-*')
-    if redis.exists('blacklists:global'):
-        globalData = dill.loads(redis.get('blacklists:global'))
-    else:
-        globalData = {}
-    for key in local_keys:
-        data = dill.loads(redis.get(key))
-        localBlacklists[int(key[11:])] = Blacklist(
-            bio=data.get('bio', None),
-            url=data.get('url', None),
-            tgid=data.get('tgid', None),
-            txt=data.get('txt', None)
-        )
-    for option, value in globalData.items():
-        setattr(GlobalBlacklist, option, value)
-    if redis.exists('blacklist:users'):
-        blacklistedUsers = dill.loads(redis.get('blacklist:users'))
-    if redis.exists('whitelist:users'):
-        whitelistedUsers = dill.loads(redis.get('whitelist:users'))
-    if redis.exists('whitelist:chats'):
-        whitelistedChats = dill.loads(redis.get('whitelist:chats'))
+    migrate_dill_blobs()
+    pipe = redis.pipeline(transaction=False)
+    keys = [key.decode() for key in redis.scan_iter('blacklists:*')]
+    for key in keys:
+        pipe.smembers(key)
+    pipe.hgetall('blacklist:users')
+    pipe.smembers('whitelist:users')
+    pipe.smembers('whitelist:chats')
+    *members, banned, wl_users, wl_chats = pipe.execute()
+
+    for key, values in zip(keys, members):
+        _, blkey, option = key.split(':')
+        values = [decode_value(option, value) for value in values]
+        if blkey == 'global':
+            setattr(GlobalBlacklist, option, values)
+        else:
+            blacklist = localBlacklists.setdefault(int(blkey), Blacklist())
+            setattr(blacklist, option, values)
+    blacklistedUsers = {
+        int(user): tuple(json.loads(ban)) for user, ban in banned.items()
+    }
+    whitelistedUsers = {int(user) for user in wl_users}
+    whitelistedChats = {int(chat) for chat in wl_chats}
 
 
 async def append(
     key: str or bytes, option: str, values: List[Union[str, int]]
 ) -> Tuple[list, list]:
-    """Create/Append values to keys in Redis DB"""
-    added = []
-    skipped = []
-
-    if redis.exists(key):
-        data = dill.loads(redis.get(key))
-        if option in data:
-            for value in values:
-                if value in data[option]:
-                    skipped.append(value)
-                    continue  # The value is already stored in the DB
-                else:
-                    data[option].append(value)
-                    added.append(value)
-        else:
-            data.setdefault(option, []).extend(values)
-            added.extend(values)
-        data = dill.dumps(data)
-    else:
-        data = dill.dumps({option: values})
-    redis.set(key, data)
+    """Add values to the Redis set of a blacklist option"""
+    pipe = redis.pipeline(transaction=False)
+    for value in values:
+        pipe.sadd(f"{key}:{option}", value)
+    results = pipe.execute()
+    added = [value for value, new in zip(values, results) if new]
+    skipped = [value for value, new in zip(values, results) if not new]
 
     key = key[11:]
     blkey = key if key.isalpha() else int(key)
@@ -180,6 +231,8 @@ async def append(
                 setattr(localBlacklists[blkey], option, lval)
             else:
                 localBlacklists[blkey] = Blacklist(**{option: added})
+        if (blkey, option) in matchers:
+            matchers[(blkey, option)].add(*added)
 
     return added, skipped
 
@@ -187,35 +240,14 @@ async def append(
 async def unappend(
     key: str or bytes, option: str, values: List[Union[str, int]]
 ) -> Tuple[list, list]:
-    """Remove/Unappend values to keys from Redis DB"""
-    removed = []
-    skipped = []
-    empty = False
-    if redis.exists(key):
-        data = dill.loads(redis.get(key))
-        if option in data:
-            for value in values:
-                if value in data[option]:
-                    data[option].remove(value)
-                    removed.append(value)
-                else:
-                    skipped.append(value)
-            for x, y in data.copy().items():
-                if len(y) == 0:
-                    del data[x]
-            if len(data) == 0:
-                empty = True
-            else:
-                data = dill.dumps(data)
-        else:
-            return removed, skipped
-    else:
-        return removed, skipped
-
-    if empty:
-        redis.delete(key)
-    else:
-        redis.set(key, data)
+    """Remove values from the Redis set of a blacklist option"""
+    pipe = redis.pipeline(transaction=False)
+    for value in values:
+        pipe.srem(f"{key}:{option}", value)
+    results = pipe.execute()
+    removed = [value for value, old in zip(values, results) if old]
+    skipped = [value for value, old in zip(values, results) if not old]
+    removed_set = set(removed)
 
     key = key[11:]
     blkey = key if key.isalpha() else int(key)
@@ -223,9 +255,7 @@ async def unappend(
         if blkey == 'global':
             gval = getattr(GlobalBlacklist, option, None)
             if gval:
-                for value in removed:
-                    if value in gval:
-                        gval.remove(value)
+                gval[:] = [v for v in gval if v not in removed_set]
                 if gval:
                     setattr(GlobalBlacklist, option, gval)
                 else:
@@ -234,13 +264,13 @@ async def unappend(
             if blkey in localBlacklists:
                 lval = getattr(localBlacklists[blkey], option, None)
                 if lval:
-                    for value in removed:
-                        if value in lval:
-                            lval.remove(value)
+                    lval[:] = [v for v in lval if v not in removed_set]
                     if lval:
                         setattr(localBlacklists[blkey], option, lval)
                     else:
                         setattr(localBlacklists[blkey], option, None)
+        if (blkey, option) in matchers:
+            matchers[(blkey, option)].discard(*removed)
 
     return removed, skipped
 
@@ -368,7 +398,7 @@ async def whitelister(event: NewMessage.Event) -> None:
     if match:
         args, _ = await client.parse_arguments(match)
         for user in args:
-            if user in whitelistedUsers + whitelistedChats:
+            if user in whitelistedUsers or user in whitelistedChats:
                 skipped.append(f"`{user}`")
                 continue
             try:
@@ -394,24 +424,27 @@ async def whitelister(event: NewMessage.Event) -> None:
     if users:
         usertext = ''
         count = 0
+        added = []
         for user in users:
             entity = await client.get_peer_id(user)
             name = get_display_name(user)
             name = f"[{name}](tg://user?id={entity})"
             if entity not in whitelistedUsers:
-                whitelistedUsers.append(entity)
+                whitelistedUsers.add(entity)
+                added.append(entity)
                 usertext += f"  {name}"
                 count = 1
             else:
                 skipped.append(name)
         if count != 0:
-            redis.set('whitelist:users', dill.dumps(whitelistedUsers))
+            redis.sadd('whitelist:users', *added)
             text += "**Whitelisted users:**\n" + usertext
             log += text
             await event.answer(text, log=None if chats else ("whitelist", log))
     if chats:
         chattext = ''
         count = 0
+        added = []
         for chat in chats:
             if chat.username:
                 name = f"[{chat.title}](tg://resolve?domain={chat.username})"
@@ -419,7 +452,8 @@ async def whitelister(event: NewMessage.Event) -> None:
                 name = f"`{chat.id}`"
             entity = await client.get_peer_id(chat)
             if entity not in whitelistedChats:
-                whitelistedChats.append(entity)
+                whitelistedChats.add(entity)
+                added.append(entity)
                 chattext += f"  {name}"
                 count = 1
             else:
@@ -429,7 +463,7 @@ async def whitelister(event: NewMessage.Event) -> None:
                 text += "\n\n**Whitelisted chats:**\n" + chattext
             else:
                 text += "**Whitelisted chats:**\n" + chattext
-            redis.set('whitelist:chats', dill.dumps(whitelistedChats))
+            redis.sadd('whitelist:chats', *added)
             log += text
             await event.answer(text, log=("whitelist", log))
     if skipped:
@@ -489,18 +523,17 @@ async def unwhitelister(event: NewMessage.Event) -> None:
     if users and whitelistedUsers:
         count = 0
         usertext = ''
+        removed = []
         for user in users:
             if user in whitelistedUsers:
-                whitelistedUsers.remove(user)
+                whitelistedUsers.discard(user)
+                removed.append(user)
                 usertext += f" `{user}`"
                 count = 1
             else:
                 skipped.append(f"`{user}`")
         if count:
-            if whitelistedUsers:
-                redis.set('whitelist:users', dill.dumps(whitelistedUsers))
-            else:
-                redis.delete('whitelist:users')
+            redis.srem('whitelist:users', *removed)
             text += "**Un-whitelisted users:**\n" + usertext
             log += text
             await event.answer(
@@ -509,18 +542,17 @@ async def unwhitelister(event: NewMessage.Event) -> None:
     if chats and whitelistedChats:
         count = 0
         chattext = ''
+        removed = []
         for chat in chats:
             if chat in whitelistedChats:
-                whitelistedChats.remove(chat)
+                whitelistedChats.discard(chat)
+                removed.append(chat)
                 chattext += f" `{chat}`"
                 count = 1
             else:
                 skipped.append(f"`{chat}`")
         if count:
-            if whitelistedChats:
-                redis.set('whitelist:chats', dill.dumps(whitelistedChats))
-            else:
-                redis.delete('whitelist:chats')
+            redis.srem('whitelist:chats', *removed)
             if text:
                 text += "**\n\nUn-whitelisted chats:**\n" + chattext
             else:
@@ -642,14 +674,14 @@ async def unblacklistuser(event: NewMessage.Event) -> None:
     if users and blacklistedUsers:
         text = "**Un-blacklisted users:**\n"
         targets = []
+        removed = []
         for user in users:
             if user in blacklistedUsers:
-                blacklistedUsers.remove(user)
+                blacklistedUsers.pop(user)
+                removed.append(user)
                 targets.append(f"[{user}](tg://user?id={user})")
-        if blacklistedUsers:
-            redis.set('blacklist:users', dill.dumps(blacklistedUsers))
-        else:
-            redis.delete('blacklist:users')
+        if removed:
+            redis.hdel('blacklist:users', *removed)
         text += ", ".join(targets)
         await event.answer(text, log=('unblacklist', text))
     if skipped:
@@ -683,13 +715,13 @@ async def listwls(event: NewMessage.Event) -> None:
         if option in ['user', 'users']:
             if whitelistedUsers:
                 text = "**Whitelisted users:**\n"
-                text += ', '.join([f'`{x}`' for x in whitelistedUsers])
+                text += ', '.join([f'`{x}`' for x in sorted(whitelistedUsers)])
             else:
                 text = "__There are no whitelisted users.__"
         else:
             if whitelistedChats:
                 text = "**Whitelisted chats:**\n"
-                text += ', '.join([f'`{x}`' for x in whitelistedChats])
+                text += ', '.join([f'`{x}`' for x in sorted(whitelistedChats)])
             else:
                 text = "__There are no whitelisted chats.__"
     else:
@@ -700,10 +732,10 @@ async def listwls(event: NewMessage.Event) -> None:
 
         if whitelistedUsers:
             text += "**Whitelisted users:**\n"
-            text += ', '.join([f'`{x}`' for x in whitelistedUsers])
+            text += ', '.join([f'`{x}`' for x in sorted(whitelistedUsers)])
         if whitelistedChats:
             text += "\n**Whitelisted chats:**\n"
-            text += ', '.join([f'`{x}`' for x in whitelistedChats])
+            text += ', '.join([f'`{x}`' for x in sorted(whitelistedChats)])
 
     await event.answer(text)
 
@@ -756,7 +788,76 @@ async def listbld(event: NewMessage.Event) -> None:
     await event.answer(text)
 
 
-@client.onMessage(incoming=True)
+@client.onMessage(
+    command=("exportlists/importlists", plugin_category),
+    outgoing=True, regex=ie_pattern
+)
+async def import_export(event: NewMessage.Event) -> None:
+    """Export the whitelists and blacklisted users or import a file"""
+    if not redis:
+        await event.answer(
+            "`You need to use a Redis session to use blacklists.`"
+        )
+        return
+
+    if event.matches[0].group('action') == 'ex':
+        lists = {
+            'whitelisted_users': sorted(whitelistedUsers),
+            'whitelisted_chats': sorted(whitelistedChats),
+            'blacklisted_users': {
+                str(user): ban for user, ban in blacklistedUsers.items()
+            }
+        }
+        data = await client.loop.run_in_executor(None, json.dumps, lists)
+        exported = io.BytesIO(data.encode())
+        exported.name = "lists.json"
+        await event.answer(
+            f"`Exported {len(whitelistedUsers)} users, "
+            f"{len(whitelistedChats)} chats and "
+            f"{len(blacklistedUsers)} blacklisted users.`"
+        )
+        await client.send_file(
+            event.chat_id, exported, force_document=True, reply_to=event
+        )
+        return
+
+    reply = await event.get_reply_message()
+    if not reply or not reply.document:
+        await event.answer("`Reply to an exported lists file to import it.`")
+        return
+
+    data = io.BytesIO()
+    await client.download_media(reply, data)
+    try:
+        users, chats, banned = await client.loop.run_in_executor(
+            None, parse_lists, data.getvalue()
+        )
+    except (ValueError, TypeError, AttributeError) as e:
+        await event.answer(f"`Couldn't import the lists: {e}`")
+        return
+
+    users -= whitelistedUsers
+    chats -= whitelistedChats
+    banned = {
+        user: ban for user, ban in banned.items()
+        if user not in blacklistedUsers
+    }
+    await client.loop.run_in_executor(
+        None, store_lists, users, chats, banned
+    )
+    whitelistedUsers.update(users)
+    whitelistedChats.update(chats)
+    blacklistedUsers.update(banned)
+    text = (
+        f"**Imported lists:**\n`{len(users)} users, {len(chats)} chats and "
+        f"{len(banned)} blacklisted users.`"
+    )
+    await event.answer(text, log=('whitelist', text))
+
+
+@client.onMessage(
+    incoming=True, private=False, condition=lambda e: redis
+)
 async def inc_listener(event: NewMessage.Event) -> None:
     """Filter incoming messages for blacklisting."""
     broadcast = getattr(event.chat, 'broadcast', False)
@@ -787,37 +888,15 @@ async def inc_listener(event: NewMessage.Event) -> None:
         except Exception as e:
             LOGGER.debug(e)
 
-    if GlobalBlacklist.txt:
-        for value in GlobalBlacklist.txt:
-            string = await escape_string(value)
-            if re.search(string, event.text, flags=re.I):
-                text = str_text.format(value)
-                match = value
-                break
-    elif localbl and getattr(localbl, 'txt', False):
-        for value in localBlacklists[event.chat_id].txt:
-            string = await escape_string(value)
-            if re.search(string, event.text, flags=re.I):
-                text = str_text.format(value)
-                match = value
-                break
+    match = await match_blacklists(event.chat_id, 'txt', event.text)
+    if match:
+        text = str_text.format(match)
     if text and await ban_user(event, text, 'txt', match):
         return
 
-    if GlobalBlacklist.url:
-        for value in GlobalBlacklist.url:
-            string = re.sub(r'(?<!\\)\*', r'\\w+', value, count=0)
-            if re.search(string, event.text, flags=re.I):
-                text = url_str.format(value)
-                match = value
-                break
-    elif localbl and getattr(localbl, 'url', False):
-        for value in localBlacklists[event.chat_id].url:
-            string = re.sub(r'(?<!\\)\*', r'\\w+', value, count=0)
-            if re.search(string, event.text, flags=re.I):
-                text = url_str.format(value)
-                match = value
-                break
+    match = await match_blacklists(event.chat_id, 'url', event.text)
+    if match:
+        text = url_str.format(match)
     if text and await ban_user(event, text, 'url', match):
         return
 
@@ -834,10 +913,12 @@ async def inc_listener(event: NewMessage.Event) -> None:
             ):
                 entity = id_pattern.search(
                     event.text[entity.offset:entity.offset+entity.length]
-                ).group('e')
-                value = await client.get_peer_id(entity) if entity else 0
+                )
+                value = (
+                    await resolve_peer_id(entity.group('e')) if entity else 0
+                )
             elif isinstance(entity, types.MessageEntityMentionName):
-                value = await client.get_peer_id(entity.user_id)
+                value = await resolve_peer_id(entity.user_id)
             else:
                 value = None
 
@@ -864,87 +945,150 @@ async def inc_listener(event: NewMessage.Event) -> None:
 @client.on(ChatAction)
 async def bio_filter(event: ChatAction.Event) -> None:
     """Filter incoming messages for blacklisting."""
-    match = False
     broadcast = getattr(event.chat, 'broadcast', False)
 
     if not redis or event.is_private or broadcast:
         return
 
     if event.user_added or event.user_joined:
+        context = UpdateContext.get(event)
         try:
-            sender = await event.get_input_user()
-            chat = await event.get_chat()
-            sender_id = await client.get_peer_id(sender)
-            chat_id = await client.get_peer_id(chat)
-            localbl = localBlacklists.get(chat_id, False)
+            users = await context.get_input_users()
+            chat = await context.get_chat()
+            chat_id = await context.get_peer_id(chat)
         except (ValueError, TypeError):
             return
-        if (
-            chat_id in whitelistedChats or
-            sender_id in whitelistedUsers or
-            await is_admin(chat_id, sender_id)
-        ):
-            return
-        elif sender_id in blacklistedUsers:
-            if sender_id not in temp_banlist:
-                await ban_user(event, blacklisted_text)
+        users = [u for u in users if isinstance(u, types.InputPeerUser)]
+        if not users or chat_id in whitelistedChats:
             return
 
-        user = await client(functions.users.GetFullUserRequest(id=sender))
-        if GlobalBlacklist.bio:
-            for value in GlobalBlacklist.bio:
-                bio = await escape_string(value)
-                if re.search(bio, user.about, flags=re.I):
-                    match = value
-                    break
-        elif localbl and getattr(localbl, 'bio', False):
-            for value in localBlacklists[chat_id].bio:
-                bio = await escape_string(value)
-                if re.search(bio, user.about, flags=re.I):
-                    match = value
-                    break
+        if len(users) > 1:
+            # Several users can be added at once, fetch their bios together
+            await asyncio.gather(*(
+                get_bio(user) for user in users
+                if user.user_id not in whitelistedUsers and
+                user.user_id not in blacklistedUsers
+            ), return_exceptions=True)
 
-        if match:
-            await ban_user(event, bio_text.format(match), 'bio', match)
+        for user in users:
+            sender_id = user.user_id
+            if (
+                sender_id in whitelistedUsers or
+                await is_admin(chat_id, sender_id)
+            ):
+                continue
+            elif sender_id in blacklistedUsers:
+                if sender_id not in temp_banlist:
+                    await ban_user(event, blacklisted_text, user=user)
+                continue
+
+            try:
+                bio = await get_bio(user)
+            except Exception as e:
+                LOGGER.debug(e)
+                continue
+            match = await match_blacklists(chat_id, 'bio', bio)
+            if match:
+                await ban_user(
+                    event, bio_text.format(match), 'bio', match, user=user
+                )
+
+
+async def get_bio(user: types.InputPeerUser) -> str:
+    """Get a user's cached bio or fetch it once for every caller"""
+    bio = bios.get(user.user_id, None)
+    if bio is not None:
+        return bio
+
+    task = bio_tasks.get(user.user_id, None)
+    if task is None:
+        task = client.loop.create_task(fetch_bio(user))
+        bio_tasks[user.user_id] = task
+        task.add_done_callback(lambda t: bio_tasks.pop(user.user_id, None))
+    return await asyncio.shield(task)
 
 
-async def escape_string(string: str) -> str:
+async def fetch_bio(user: types.InputPeerUser) -> str:
+    async with bio_semaphore:
+        full = await client(functions.users.GetFullUserRequest(id=user))
+    bio = full.about or ''
+    bios.set(user.user_id, bio)
+    return bio
+
+
+def wildcard_string(string: str) -> str:
     """Literal match everything but * and ?"""
     string = re.sub(r'(?<!\\)\*', '.+', string, count=0)
-    string = re.sub(r'(?<!\\)\?', '.', string, count=0)
-    return string
+    return re.sub(r'(?<!\\)\?', '.', string, count=0)
+
+
+def wildcard_url(string: str) -> str:
+    """Match any word for every * in an URL"""
+    return re.sub(r'(?<!\\)\*', r'\\w+', string, count=0)
+
+
+translators = {
+    'bio': wildcard_string,
+    'txt': wildcard_string,
+    'url': wildcard_url
+}
+
+
+async def get_matcher(
+    blkey: Union[str, int], option: str
+) -> Union[PatternMatcher, None]:
+    """Get the compiled matcher of a blacklist option, if it has values"""
+    if blkey == 'global':
+        blacklist = GlobalBlacklist
+    else:
+        blacklist = localBlacklists.get(blkey, None)
+    values = getattr(blacklist, option, None)
+    if not values:
+        return None
+
+    matcher = matchers.get((blkey, option), None)
+    if matcher is None:
+        matcher = PatternMatcher(values, translators[option])
+        matchers[(blkey, option)] = matcher
+    await matcher.prepare()
+    return matcher
+
+
+async def match_blacklists(
+    chat_id: int, option: str, string: str
+) -> Union[str, None]:
+    """Get the global or local value of an option matching the string"""
+    for blkey in ('global', chat_id):
+        matcher = await get_matcher(blkey, option)
+        match = matcher.search(string) if matcher else None
+        if match:
+            return match
+    return None
 
 
 async def is_admin(chat_id, sender_id) -> bool:
-    """Check if the sender is an admin or bot"""
-    try:
-        result = await client(functions.channels.GetParticipantRequest(
-            channel=chat_id,
-            user_id=sender_id
-        ))
-        if isinstance(
-            result.participant,
-            (types.ChannelParticipantAdmin, types.ChannelParticipantCreator)
-        ):
-            return True
-    except Exception:
-        return False
+    """Check if the sender is an admin using the cached admin rosters"""
+    return await client.admins.is_admin(chat_id, sender_id)
 
 
 async def ban_user(
     event: NewMessage.Event or ChatAction.Event, text: str,
-    bl_type: str = None, match: Union[str, int] = None
+    bl_type: str = None, match: Union[str, int] = None,
+    user: types.InputPeerUser = None
 ) -> bool:
-    if isinstance(event, NewMessage.Event):
-        sender = await event.get_input_sender()
+    context = UpdateContext.get(event)
+    if user:
+        sender = user
+    elif isinstance(event, NewMessage.Event):
+        sender = await context.get_input_sender()
     else:
-        sender = await event.get_input_user()
-    temp_banlist.append(sender)
-    chat = await event.get_chat()
+        sender = await context.get_input_user()
+    chat = await context.get_chat()
     ban_right = getattr(chat.admin_rights, 'ban_users', False)
     delete_messages = getattr(chat.admin_rights, 'delete_messages', False)
     if not (ban_right or chat.creator):
         return False
+    temp_banlist.add(sender.user_id)
     try:
         await client.edit_permissions(
             entity=chat.id,
@@ -954,25 +1098,61 @@ async def ban_user(
         if delete_messages:
             await event.delete()
         await event.respond(text)
-        if client.logger:
-            logger_group = client.config['userbot'].getint(
-                'logger_group_id', 'me'
-            )
-            log_text = (
-                "**USERBOT LOG** #blacklist\n"
-                f"Banned {sender.user_id} from {chat.id}.\n{text}."
-            )
-            await client.send_message(logger_group, log_text)
+        log_text = (
+            "**USERBOT LOG** #blacklist\n"
+            f"Banned {sender.user_id} from {chat.id}.\n{text}."
+        )
+        client.log_sink.put(log_text)
         if bl_type and match:
             blacklistedUsers.update({sender.user_id: (bl_type, match)})
-            redis.set('blacklist:users', dill.dumps(blacklistedUsers))
+            redis.hset(
+                'blacklist:users', sender.user_id,
+                json.dumps((bl_type, match))
+            )
         return True
     except Exception as e:
         await event.respond(f"**Couldn't ban user due to {e}**")
         LOGGER.exception(e)
         return False
     finally:
-        temp_banlist.remove(sender)
+        temp_banlist.discard(sender.user_id)
+
+
+def parse_lists(
+    data: bytes
+) -> Tuple[Set[int], Set[int], Dict[int, Tuple[str, Union[str, int]]]]:
+    """Load the whitelists and blacklisted users of an exported file"""
+    data = json.loads(data)
+    users = {int(user) for user in data.get('whitelisted_users', ())}
+    chats = {int(chat) for chat in data.get('whitelisted_chats', ())}
+    banned = {
+        int(user): tuple(ban)
+        for user, ban in data.get('blacklisted_users', {}).items()
+    }
+    return users, chats, banned
+
+
+def store_lists(
+    users: Set[int],
+    chats: Set[int],
+    banned: Dict[int, Tuple[str, Union[str, int]]]
+) -> None:
+    """Add the entries to Redis in pipelined chunks"""
+    pipe = redis.pipeline(transaction=False)
+    for chunk in chunks(list(users), IMPORT_CHUNK):
+        pipe.sadd('whitelist:users', *chunk)
+    for chunk in chunks(list(chats), IMPORT_CHUNK):
+        pipe.sadd('whitelist:chats', *chunk)
+    for chunk in chunks(list(banned.items()), IMPORT_CHUNK):
+        pipe.hset('blacklist:users', mapping={
+            user: json.dumps(ban) for user, ban in chunk
+        })
+    pipe.execute()
+
+
+def chunks(values: list, size: int) -> Iterable[list]:
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
 
 
 async def blattributes(blacklist) -> str:
@@ -1063,6 +1243,39 @@ async def append_args_to_list(
     return option
 
 
+async def resolve_peer_id(entity: str or int) -> Union[int, None]:
+    """Get the cached peer ID of a mention, resolving each one only once"""
+    if isinstance(entity, str):
+        entity = int(entity) if entity.lstrip('-').isdigit() else entity
+        if isinstance(entity, str):
+            entity = entity.lower()
+    if isinstance(entity, int):
+        return await client.get_peer_id(entity)
+    if entity in peer_ids:
+        return peer_ids.get(entity)
+
+    task = peer_tasks.get(entity, None)
+    if task is None:
+        task = client.loop.create_task(_resolve_username(entity))
+        peer_tasks[entity] = task
+        task.add_done_callback(lambda t: peer_tasks.pop(entity, None))
+    return await asyncio.shield(task)
+
+
+async def _resolve_username(username: str) -> Union[int, None]:
+    try:
+        peer = await client.get_peer_id(username)
+    except (ValueError, TypeError, errors.BadRequestError) as e:
+        LOGGER.debug("Couldn't resolve %s: %s", username, e)
+        peer_ids.set(username, None, UNRESOLVED_TTL)
+        return None
+    except Exception as e:
+        LOGGER.debug(e)
+        return None
+    peer_ids.set(username, peer)
+    return peer
+
+
 async def get_peer_id(entity: str or int) -> int:
     peer = None
     try:
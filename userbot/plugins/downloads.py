@@ -147,20 +147,11 @@ async def upload(event: NewMessage.Event) -> None:
         prog = ProgressCallback(event, filen=await _get_file_name(f, False))
         attributes, mime_type = get_attributes(str(f))
         ul = io.open(f, 'rb')
-        uploaded = await client.fast_upload_file(
-            file=ul, progress_callback=prog.up_progress
+        await client.fast_send_file(
+            event.chat_id, ul, progress_callback=prog.up_progress,
+            attributes=attributes, mime_type=mime_type, reply_to=event
         )
         ul.close()
-        media = types.InputMediaUploadedDocument(
-            file=uploaded,
-            mime_type=mime_type,
-            attributes=attributes,
-            thumb=None
-        )
-        await client.send_file(
-            event.chat_id, file=media,
-            force_document=True, reply_to=event
-        )
 
     await event.answer(f"__Successfully uploaded {files}.__")
 
@@ -15,11 +15,13 @@
 # along with TG-UserBot.  If not, see <https://www.gnu.org/licenses/>.
 
 
+import inspect
 import os.path
 from typing import Tuple
 
 from userbot import client
-from userbot.utils.events import NewMessage
+from userbot.utils.context import UpdateContext
+from userbot.utils.events import dispatch_stats, handler_stats, NewMessage
 
 
 plugin_category: str = "helper"
@@ -216,11 +218,12 @@ async def helper(event: NewMessage.Event) -> None:
                 f"  **Info:** `{command.info}`\n"
             )
             if arg1:
-                filename = os.path.relpath(command.func.__code__.co_filename)
+                func = inspect.unwrap(command.func)
+                filename = os.path.relpath(func.__code__.co_filename)
                 text += (
-                    f"  **Registered function:** `{command.func.__name__}`\n"
+                    f"  **Registered function:** `{func.__name__}`\n"
                     f"    **File:** `{filename}`\n"
-                    f"    **Line:** `{command.func.__code__.co_firstlineno}`\n"
+                    f"    **Line:** `{func.__code__.co_firstlineno}`\n"
                 )
         elif arg in categories:
             category = categories.get(arg)
@@ -246,6 +249,92 @@ async def helper(event: NewMessage.Event) -> None:
     await event.answer(text)
 
 
+@client.onMessage(
+    command=("stats", plugin_category), builtin=True,
+    outgoing=True, regex=r"stats(?: |$)(\w+)?$"
+)
+async def stats(event: NewMessage.Event) -> None:
+    """The slowest handlers overall or of a plugin, or the sent requests."""
+    plugin = event.matches[0].group(1)
+    if plugin == "requests":
+        await event.answer(await request_stats())
+        return
+
+    handlers = client.metrics.top(plugin)
+    if not handlers:
+        await event.answer("`There are no handler stats to show yet.`")
+        return
+
+    text = f"**Handler stats{' for ' + plugin if plugin else ''}:**"
+    if not plugin:
+        text += (
+            f"\n  `Messages: {dispatch_stats['new']} new, "
+            f"{dispatch_stats['edited']} edited, "
+            f"{dispatch_stats['unchanged_edits']} unchanged edits skipped`"
+        )
+    for h in handlers:
+        short_circuited = handler_stats.get(h.name, {}).get(
+            'short_circuited', 0
+        )
+        text += (
+            f"\n\n**{h.name.rsplit('.', 1)[-1]}** __({h.plugin})__\n"
+            f"  `Calls: {h.calls}, errors: {h.errors}, "
+            f"skipped: {short_circuited}`\n"
+            f"  `p50/p95/p99: {h.percentile(50) * 1000:.0f}/"
+            f"{h.percentile(95) * 1000:.0f}/"
+            f"{h.percentile(99) * 1000:.0f}ms`\n"
+            f"  `Total: {h.total_time:.2f}s, CPU: {h.cpu_time:.2f}s, "
+            f"requests: {h.rpc_time:.2f}s`"
+        )
+    await event.answer(text)
+
+
+async def request_stats() -> str:
+    requests = client.metrics.top_requests()
+    if not requests:
+        return "`No requests have been sent yet.`"
+
+    saved = client.singleflight.stats
+    text = (
+        "**Request stats:**\n"
+        f"  `Coalesced: {saved['coalesced']}, cached: {saved['cached']}, "
+        f"delayed: {client.scheduler.stats['delayed']}, "
+        f"retried: {client.scheduler.stats['retried']}`"
+    )
+    transfers = client.metrics.transfers
+    lookups = (
+        transfers['upload_cache_hits'] + transfers['upload_cache_misses']
+    )
+    if lookups:
+        text += (
+            f"\n  `Upload cache: {transfers['upload_cache_hits']}/{lookups} "
+            f"hits, {transfers['upload_cache_bytes'] / 1048576:.1f}MB saved`"
+        )
+    lookups = UpdateContext.stats
+    if lookups['fetched']:
+        text += (
+            f"\n  `Update entities: {lookups['fetched']} fetched, "
+            f"{lookups['shared']} shared between handlers`"
+        )
+    admins = client.admins
+    if admins.hits + admins.misses:
+        text += (
+            f"\n  `Admin cache: {admins.hits}/{admins.hits + admins.misses} "
+            f"hits, {len(admins.rosters)} chats cached`"
+        )
+    for r in requests:
+        handler, count = r.handlers.most_common(1)[0]
+        handler = handler.rsplit('.', 1)[-1] if handler else "none"
+        text += (
+            f"\n\n**{r.name}**\n"
+            f"  `Calls: {r.calls}, errors: {r.errors}, "
+            f"avg: {r.total_time / r.calls * 1000:.0f}ms`\n"
+            f"  `FloodWaits: {r.flood_waits} ({r.flood_seconds}s)`\n"
+            f"  `Mostly from: {handler} ({count})`"
+        )
+    return text
+
+
 async def solve_commands(commands: dict) -> Tuple[dict, dict]:
     new_dict: dict = {}
     com_tuples = {}
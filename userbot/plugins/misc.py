@@ -64,6 +64,7 @@ async def shutdown(event: NewMessage.Event) -> None:
     client.reconnect = False
     print()
     LOGGER.info("Disconnecting the client and exiting the main script.")
+    await client.log_sink.flush()
     await client.disconnect()
 
 
@@ -248,7 +249,8 @@ async def resolver(event: NewMessage.Event) -> None:
 
 
 @client.onMessage(
-    command=("mention", plugin_category), outgoing=True
+    command=("mention", plugin_category), outgoing=True,
+    condition=lambda e: e.message.entities
 )
 async def bot_mention(event: NewMessage.Event) -> None:
     """Mention a user in the bot like link with a custom name."""
@@ -23,6 +23,7 @@ from typing import Dict, List
 from telethon.tl import functions, types
 
 from userbot import client
+from userbot.utils.context import UpdateContext
 from userbot.utils.helpers import get_chat_link
 from userbot.utils.events import NewMessage
 from userbot.utils.sessions import RedisSession
@@ -86,15 +87,19 @@ if redis:
         approvedUsers = dill.loads(redis.get('approved:users'))
 
 
-@client.onMessage(incoming=True, edited=False)
+@client.onMessage(
+    incoming=True, edited=False, private=True,
+    condition=lambda e: PM_PERMIT and redis
+)
 async def pm_incoming(event: NewMessage.Event) -> None:
     """Filter incoming messages for blocking."""
     if not PM_PERMIT or not redis or not event.is_private:
         return
     out = None
     new_pm = False
-    entity = await event.get_sender()
-    input_entity = await event.get_input_sender()
+    context = UpdateContext.get(event)
+    entity = await context.get_sender()
+    input_entity = await context.get_input_sender()
     sender = getattr(event, 'from_id', entity.id)
 
     if (
@@ -170,7 +175,10 @@ async def pm_incoming(event: NewMessage.Event) -> None:
     spammers[sender] = (event.text, count-1, sent, lastoutmsg)
 
 
-@client.onMessage(outgoing=True, edited=False)
+@client.onMessage(
+    outgoing=True, edited=False, private=True,
+    condition=lambda e: PM_PERMIT and redis and e.chat_id not in approvedUsers
+)
 async def pm_outgoing(event: NewMessage.Event) -> None:
     """Filter outgoing messages for auto-approving."""
     if (
@@ -178,12 +186,13 @@ async def pm_outgoing(event: NewMessage.Event) -> None:
         event.chat_id in approvedUsers
     ):
         return
-    chat = await event.get_chat()
+    context = UpdateContext.get(event)
+    chat = await context.get_chat()
     if chat.verified or chat.support or chat.bot:
         return
 
     result = await client.get_messages(
-        await event.get_input_chat(), reverse=True, limit=1
+        await context.get_input_chat(), reverse=True, limit=1
     )
     if result[0].out:
         if chat.id not in approvedUsers:
@@ -24,6 +24,7 @@ from telethon.tl import types
 from telethon.utils import get_attributes
 
 from userbot import client
+from userbot.utils.editor import EditScheduler
 from userbot.utils.helpers import is_ffmpeg_there, ProgressCallback
 from userbot.helper_funcs.yt_dl import (
     extract_info, list_formats, ProgressHook, YTdlLogger
@@ -85,7 +86,9 @@ success = "`Successfully downloaded` {}"
 async def yt_dl(event):
     """Download videos from YouTube with their url in multiple formats."""
     match = event.matches[0].group(1)
+    editor = EditScheduler.get(event)
     if not match:
+        await editor.flush()
         await event.answer(
             "`.ytdl <url>` or `.ytdl <url1> .. <urln> format=<fmt>`"
         )
@@ -117,11 +120,13 @@ async def yt_dl(event):
             if fmts:
                 text = "**Formats:**\n"
                 text += ",\n\n".join(f"```{f}```" for f in fmts)
+                await editor.flush()
                 await event.answer(text)
             if warnings:
                 text = "**Warnings:**\n"
                 text += ",\n\n".join(f"```{w}```" for w in warnings)
                 reply = True if fmts else False
+                await editor.flush()
                 await event.answer(text, reply=reply)
             return
         elif fmt in audioFormats and ffmpeg:
@@ -154,6 +159,8 @@ async def yt_dl(event):
     progress_cb = ProgressCallback(event)
 
     for url in args:
+        # Don't let a queued progress edit overwrite the new status
+        await editor.flush()
         await event.answer(f"`Processing {url}...`")
         output = await extract_info(
             loop=client.loop, ydl_opts=params, url=url, download=True,
@@ -172,31 +179,24 @@ async def yt_dl(event):
 
             dl = io.open(path, 'rb')
             progress_cb.filen = title
-            uploaded = await client.fast_upload_file(
-                dl, progress_cb.up_progress
-            )
-            dl.close()
-
             attributes, mime_type = await fix_attributes(
                 path, info, round_message, supports_streaming
             )
-            media = types.InputMediaUploadedDocument(
-                file=uploaded,
-                mime_type=mime_type,
-                attributes=attributes,
-                thumb=await client.upload_file(thumb) if thumb else None
-            )
-
-            await client.send_file(
-                event.chat_id, media, caption=href, force_document=True
+            await client.fast_send_file(
+                event.chat_id, dl, progress_cb.up_progress,
+                attributes=attributes, mime_type=mime_type,
+                thumb=thumb, caption=href
             )
+            dl.close()
             if thumb:
                 os.remove(thumb)
     if warnings:
         text = "**Warnings:**\n"
         text += ",\n\n".join(f"```{w}```" for w in warnings)
+        await editor.flush()
         await event.answer(text)
     else:
+        await editor.flush()
         await event.delete()
 
 
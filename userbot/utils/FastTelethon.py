@@ -9,13 +9,14 @@ import hashlib
 import inspect
 import logging
 import os
+import time
 from collections import defaultdict
 from typing import (
     Optional, List, AsyncGenerator, Union,
     Awaitable, DefaultDict, Tuple, BinaryIO
 )
 
-from telethon import utils, helpers, TelegramClient
+from telethon import errors, utils, helpers, TelegramClient
 from telethon.crypto import AuthKey
 from telethon.network import MTProtoSender
 from telethon.tl.functions.auth import (
@@ -27,7 +28,8 @@ from telethon.tl.functions.upload import (
 from telethon.tl.types import (
     Document, InputFileLocation, InputDocumentFileLocation,
     InputPhotoFileLocation, InputPeerPhotoFileLocation, TypeInputFile,
-    InputFileBig, InputFile
+    InputFileBig, InputFile, InputDocument, InputMediaDocument,
+    InputMediaUploadedDocument, Message
 )
 
 log: logging.Logger = logging.getLogger(__name__)
@@ -37,6 +39,30 @@ TypeLocation = Union[
 ]
 
 
+class InputSizedFile(InputFile):
+    """InputFile with the MD5 digest and the size of the uploaded file."""
+    def __init__(self, id_, parts, name, md5, size):
+        super().__init__(id_, parts, name, md5.hexdigest())
+        self.md5 = md5.digest()
+        self.size = size
+
+
+class InputSizedFileBig(InputFileBig):
+    """InputFileBig with the MD5 digest and the size of the uploaded file."""
+    def __init__(self, id_, parts, name, md5, size):
+        super().__init__(id_, parts, name)
+        self.md5 = md5.digest()
+        self.size = size
+
+
+def md5sum(path: str, chunk_size: int = 1024 * 1024) -> 'hashlib._Hash':
+    hash_md5 = hashlib.md5()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            hash_md5.update(chunk)
+    return hash_md5
+
+
 def stream_file(file_to_stream: BinaryIO, chunk_size=1024):
     while True:
         data_read = file_to_stream.read(chunk_size)
@@ -300,12 +326,12 @@ parallel_transfer_locks: DefaultDict[int, asyncio.Lock] = defaultdict(
 
 
 async def _internal_transfer_to_telegram(
-    client: TelegramClient, response: BinaryIO, progress_callback: callable
+    client: TelegramClient, response: BinaryIO, progress_callback: callable,
+    hash_md5: 'hashlib._Hash'
 ) -> Tuple[TypeInputFile, int]:
     file_id = helpers.generate_random_long()
     file_size = os.path.getsize(response.name)
 
-    hash_md5 = hashlib.md5()
     uploader = ParallelTransferrer(client)
     part_size, part_count, is_large = await uploader.init_upload(
         file_id, file_size
@@ -316,8 +342,6 @@ async def _internal_transfer_to_telegram(
             r = progress_callback(response.tell(), file_size)
             if inspect.isawaitable(r):
                 await r
-        if not is_large:
-            hash_md5.update(data)
         if len(buffer) == 0 and len(data) == part_size:
             await uploader.upload(data)
             continue
@@ -334,10 +358,15 @@ async def _internal_transfer_to_telegram(
         await uploader.upload(bytes(buffer))
     await uploader.finish_upload()
     if is_large:
-        return InputFileBig(file_id, part_count, "upload"), file_size
+        return (
+            InputSizedFileBig(
+                file_id, part_count, "upload", hash_md5, file_size
+            ),
+            file_size
+        )
     else:
         return (
-            InputFile(file_id, part_count, "upload", hash_md5.hexdigest()),
+            InputSizedFile(file_id, part_count, "upload", hash_md5, file_size),
             file_size
         )
 
@@ -347,6 +376,7 @@ async def download_file(
     out: BinaryIO, progress_callback: callable = None
 ) -> BinaryIO:
     size = location.size
+    start = time.perf_counter()
     dc_id, location = utils.get_input_location(location)
     # We lock the transfers because telegram has connection count limits
     downloader = ParallelTransferrer(self, dc_id)
@@ -358,13 +388,77 @@ async def download_file(
             if inspect.isawaitable(r):
                 await r
 
+    self.metrics.record_transfer(
+        'download', size, time.perf_counter() - start
+    )
     return out
 
 
 async def upload_file(
-    self: TelegramClient, file: BinaryIO, progress_callback: callable = None
-) -> TypeInputFile:
-    res = (
-        await _internal_transfer_to_telegram(self, file, progress_callback)
-    )[0]
+    self: TelegramClient, file: BinaryIO, progress_callback: callable = None,
+    use_cache: bool = True
+) -> Union[TypeInputFile, InputDocument]:
+    """Upload the file, or return the document it was already sent as.
+
+    The session's sent-file cache is checked by the file's MD5 and size.
+    """
+    start = time.perf_counter()
+    size = os.path.getsize(file.name)
+    hash_md5 = await self.loop.run_in_executor(None, md5sum, file.name)
+    if use_cache:
+        try:
+            cached = self.session.get_file(
+                hash_md5.digest(), size, InputDocument
+            )
+        except TypeError:
+            # Telethon's own sessions don't store the file reference
+            cached = None
+        self.metrics.record_upload_cache(size, cached is not None)
+        if cached:
+            return cached
+
+    res, size = await _internal_transfer_to_telegram(
+        self, file, progress_callback, hash_md5
+    )
+    self.metrics.record_transfer('upload', size, time.perf_counter() - start)
     return res
+
+
+async def send_uploaded_file(
+    self: TelegramClient, entity, file: BinaryIO,
+    progress_callback: callable = None, attributes: list = None,
+    mime_type: str = None, thumb: str = None, **kwargs
+) -> Message:
+    """Fast upload a document and send it, reusing it if it was sent before.
+
+    The thumb is only uploaded if the document itself has to be.
+    """
+    uploaded = await upload_file(self, file, progress_callback)
+    if isinstance(uploaded, InputDocument):
+        try:
+            return await self.send_file(
+                entity, InputMediaDocument(uploaded),
+                force_document=True, **kwargs
+            )
+        except errors.BadRequestError as e:
+            # Most likely an expired file reference, upload it again
+            log.debug("Couldn't reuse the cached document: %s", e)
+            uploaded = await upload_file(
+                self, file, progress_callback, use_cache=False
+            )
+
+    media = InputMediaUploadedDocument(
+        file=uploaded,
+        mime_type=mime_type,
+        attributes=attributes,
+        thumb=await self.upload_file(thumb) if thumb else None
+    )
+    message = await self.send_file(
+        entity, media, force_document=True, **kwargs
+    )
+    if message and message.document:
+        self.session.cache_file(
+            uploaded.md5, uploaded.size,
+            utils.get_input_document(message.document)
+        )
+    return message
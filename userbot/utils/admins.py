@@ -0,0 +1,166 @@
+# TG-UserBot - A modular Telegram UserBot script for Python.
+# Copyright (C) 2019  Kandarp <https://github.com/kandnub>
+#
+# TG-UserBot is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# TG-UserBot is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with TG-UserBot.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import asyncio
+import logging
+import time
+from typing import Dict, Optional, Set, Tuple
+
+from telethon import TelegramClient
+from telethon.tl import functions, types
+from telethon.utils import get_peer_id
+
+
+LOGGER = logging.getLogger(__name__)
+ADMIN_TTL: int = 300
+PARTICIPANTS_LIMIT: int = 200
+ADMIN_PARTICIPANTS = (
+    types.ChannelParticipantAdmin, types.ChannelParticipantCreator,
+    types.ChatParticipantAdmin, types.ChatParticipantCreator
+)
+
+
+class AdminCache:
+    """Per chat admin rosters fetched in bulk and refreshed after a TTL.
+
+    Stale rosters are still used while a new one is being fetched in the
+    background, so only the first lookup of a chat waits for an RPC.
+    """
+    def __init__(self, client: TelegramClient, ttl: int = ADMIN_TTL):
+        self.client = client
+        self.ttl = ttl
+        self.hits: int = 0
+        self.misses: int = 0
+        self.rosters: Dict[int, Tuple[float, Set[int]]] = {}
+        self._pending: Dict[int, asyncio.Task] = {}
+
+    def get(self, chat_id: int, user_id: int) -> Optional[bool]:
+        """Check the cached roster only, None if the chat isn't cached yet."""
+        admins = self._cached(chat_id)
+        if admins is None:
+            self.client.loop.create_task(self.refresh(chat_id))
+            return None
+        return user_id in admins
+
+    async def is_admin(
+        self, chat_id: int, user_id: int, count: bool = True
+    ) -> bool:
+        """Check if the user is an admin or the creator of the chat.
+
+        Lookups which follow a ``get`` that missed shouldn't be counted again.
+        """
+        admins = self._cached(chat_id, count)
+        if admins is None:
+            admins = await self.refresh(chat_id)
+        return user_id in admins
+
+    async def refresh(self, chat_id: int) -> Set[int]:
+        """Fetch the chat's roster, concurrent refreshes share one fetch."""
+        task = self._pending.get(chat_id, None)
+        if not task:
+            task = self.client.loop.create_task(self._fetch(chat_id))
+            task.add_done_callback(
+                lambda _: self._pending.pop(chat_id, None)
+            )
+            self._pending[chat_id] = task
+        return await asyncio.shield(task)
+
+    def invalidate(self, chat_id: int = None) -> None:
+        """Forget a chat's roster or all of them if no chat is given."""
+        if chat_id is None:
+            self.rosters.clear()
+        else:
+            self.rosters.pop(chat_id, None)
+
+    async def update_handler(self, update) -> None:
+        """Keep the cached rosters up to date with admin changes."""
+        participant_update = getattr(types, 'UpdateChannelParticipant', None)
+        if participant_update and isinstance(update, participant_update):
+            chat_id = get_peer_id(types.PeerChannel(update.channel_id))
+            admin = isinstance(update.new_participant, ADMIN_PARTICIPANTS)
+        elif isinstance(update, types.UpdateChatParticipantAdmin):
+            chat_id = get_peer_id(types.PeerChat(update.chat_id))
+            admin = update.is_admin
+        else:
+            return
+
+        if chat_id in self.rosters:
+            _, admins = self.rosters[chat_id]
+            if admin:
+                admins.add(update.user_id)
+            else:
+                admins.discard(update.user_id)
+            LOGGER.debug(
+                "Updated the admin roster of %s for %s.",
+                chat_id, update.user_id
+            )
+
+    def _cached(self, chat_id: int, count: bool = True) -> Optional[Set[int]]:
+        cached = self.rosters.get(chat_id, None)
+        if cached is None:
+            if count:
+                self.misses += 1
+            return None
+
+        if count:
+            self.hits += 1
+        fetched, admins = cached
+        if time.monotonic() - fetched > self.ttl:
+            if chat_id not in self._pending:
+                self.client.loop.create_task(self.refresh(chat_id))
+        return admins
+
+    async def _fetch(self, chat_id: int) -> Set[int]:
+        admins: Set[int] = set()
+        try:
+            entity = await self.client.get_input_entity(chat_id)
+            if isinstance(entity, types.InputPeerChannel):
+                offset = 0
+                while True:
+                    result = await self.client(
+                        functions.channels.GetParticipantsRequest(
+                            channel=entity,
+                            filter=types.ChannelParticipantsAdmins(),
+                            offset=offset,
+                            limit=PARTICIPANTS_LIMIT,
+                            hash=0
+                        )
+                    )
+                    participants = getattr(result, 'participants', [])
+                    admins.update(p.user_id for p in participants)
+                    if len(participants) < PARTICIPANTS_LIMIT:
+                        break
+                    offset += len(participants)
+            elif isinstance(entity, types.InputPeerChat):
+                result = await self.client(
+                    functions.messages.GetFullChatRequest(entity.chat_id)
+                )
+                participants = getattr(
+                    result.full_chat.participants, 'participants', []
+                )
+                admins.update(
+                    p.user_id for p in participants
+                    if isinstance(p, ADMIN_PARTICIPANTS)
+                )
+        except Exception as e:
+            LOGGER.debug("Couldn't fetch the admins of %s: %s", chat_id, e)
+            # Failures aren't cached, keep using the stale roster if any
+            cached = self.rosters.get(chat_id, None)
+            return cached[1] if cached else admins
+
+        self.rosters[chat_id] = (time.monotonic(), admins)
+        return admins
@@ -17,15 +17,24 @@
 
 import configparser
 import dataclasses
+import functools
 import logging
+import time
 from typing import Dict, List
 
 from telethon import events, TelegramClient
 
-from .FastTelethon import download_file, upload_file
+from .admins import AdminCache
+from .FastTelethon import download_file, send_uploaded_file, upload_file
+from .log_sink import LoggerSink
+from .metrics import Metrics
 from .parser import parse_arguments
 from .pluginManager import PluginManager
-from .events import MessageEdited, NewMessage
+from .scheduler import RequestScheduler, scheduled
+from .self_destruct import SelfDestructWheel
+from .singleflight import SingleFlight
+from .watchdog import LoopWatchdog
+from .events import check_admin, handler_stats, NewMessage, router
 
 
 LOGGER = logging.getLogger(__name__)
@@ -42,19 +51,84 @@ class Command:
 
 class UserBotClient(TelegramClient):
     """UserBot client with additional attributes inheriting TelegramClient"""
+    admins: AdminCache = None
     commandcategories: Dict[str, List[str]] = {}
     commands: Dict[str, Command] = {}
     config: configparser.ConfigParser = None
     disabled_commands: Dict[str, Command] = {}
     failed_imports: list = []
+    log_sink: LoggerSink = None
     logger: bool = False
+    metrics: Metrics = None
     pluginManager: PluginManager = None
     plugins: list = []
-    prefix: str = None
     reconnect: bool = True
     register_commands: bool = False
     running_processes: dict = {}
+    scheduler: RequestScheduler = None
+    self_destructs: SelfDestructWheel = None
+    singleflight: SingleFlight = None
     version: int = 0
+    watchdog: LoopWatchdog = None
+    _prefix: str = None
+
+    def __init__(self, *args, **kwargs):
+        # FloodWaits are retried by the scheduler, per method and chat
+        kwargs.setdefault('flood_sleep_threshold', 0)
+        super().__init__(*args, **kwargs)
+        self.admins = AdminCache(self)
+        self.log_sink = LoggerSink(self)
+        self.metrics = Metrics(self)
+        self.scheduler = RequestScheduler(self)
+        self.singleflight = SingleFlight(self)
+        self.self_destructs = SelfDestructWheel(self)
+        self.watchdog = LoopWatchdog(self)
+        self.add_event_handler(self.admins.update_handler, events.Raw())
+
+    @property
+    def prefix(self) -> str:
+        """The current command prefix, None for the default ones"""
+        return self._prefix
+
+    @prefix.setter
+    def prefix(self, prefix: str) -> None:
+        """Recompile the command patterns whenever the prefix changes"""
+        self._prefix = prefix
+        router.rebuild(prefix)
+
+    async def __call__(self, request, *args, **kwargs):
+        """Coalesce identical requests and pace them by their FloodWaits"""
+        return await self.singleflight.call(
+            functools.partial(self.scheduler.call, self._send_request),
+            request, *args, **kwargs
+        )
+
+    async def _call(self, sender, request, *args, **kwargs):
+        """Pace the requests which are sent without going through __call__
+
+        Newer Telethon versions send e.g. the downloads of exported senders
+        with _call directly, they'd lose the FloodWait sleep otherwise.
+        """
+        call = super()._call
+        if scheduled.get():
+            return await call(sender, request, *args, **kwargs)
+        return await self.scheduler.call(
+            functools.partial(call, sender), request, *args, **kwargs
+        )
+
+    async def _send_request(self, request, *args, **kwargs):
+        """Record the request's type, latency, errors and calling handler"""
+        start = time.perf_counter()
+        error = None
+        try:
+            return await super().__call__(request, *args, **kwargs)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self.metrics.record_request(
+                request, time.perf_counter() - start, error
+            )
 
     def onMessage(
         self: TelegramClient,
@@ -69,10 +143,12 @@ class UserBotClient(TelegramClient):
         kwargs.setdefault('forwards', False)
 
         def wrapper(func: callable) -> callable:
-            events.register(NewMessage(**kwargs))(func)
-
-            if edited:
-                events.register(MessageEdited(**kwargs))(func)
+            if kwargs.get('require_admin', False):
+                func = check_admin(func)
+            func = self.metrics.wrap(func)
+            builder = NewMessage(edited=edited, **kwargs)
+            events.register(builder)(func)
+            handler_stats[f"{func.__module__}.{func.__name__}"] = builder.stats
 
             if self.register_commands and command:
                 handlers = events._get_handlers(func)
@@ -127,4 +203,5 @@ def update_dict(category: dict, name: str, command: str or list) -> None:
 
 UserBotClient.fast_download_file = download_file
 UserBotClient.fast_upload_file = upload_file
+UserBotClient.fast_send_file = send_uploaded_file
 UserBotClient.parse_arguments = parse_arguments
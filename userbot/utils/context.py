@@ -0,0 +1,98 @@
+# TG-UserBot - A modular Telegram UserBot script for Python.
+# Copyright (C) 2019  Kandarp <https://github.com/kandnub>
+#
+# TG-UserBot is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# TG-UserBot is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with TG-UserBot.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import asyncio
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, Hashable, List
+
+from telethon.events.common import EventCommon
+
+
+class UpdateContext:
+    """Entities of an update, resolved at most once for all its handlers.
+
+    The context is stored on the original update so every event built from
+    it shares the same one. Concurrent lookups await the same task.
+    """
+    stats: Counter = Counter()
+
+    def __init__(self, event: EventCommon):
+        self.event = event
+        self.client = event.client
+        self._tasks: Dict[Hashable, asyncio.Task] = {}
+        self._refs: List[Any] = []
+
+    @classmethod
+    def get(cls, event: EventCommon) -> 'UpdateContext':
+        """Get the context of the event's update, creating it if needed."""
+        update = getattr(event, 'original_update', None)
+        context = getattr(update, '_userbot_context', None)
+        if context is None:
+            context = cls(event)
+            if update is not None:
+                update._userbot_context = context
+        return context
+
+    async def get_sender(self):
+        return await self._once('sender', self.event.get_sender)
+
+    async def get_input_sender(self):
+        return await self._once('input_sender', self.event.get_input_sender)
+
+    async def get_input_user(self):
+        return await self._once('input_user', self.event.get_input_user)
+
+    async def get_input_users(self):
+        return await self._once('input_users', self._get_input_users)
+
+    async def get_chat(self):
+        return await self._once('chat', self.event.get_chat)
+
+    async def get_input_chat(self):
+        return await self._once('input_chat', self.event.get_input_chat)
+
+    async def get_peer_id(self, peer: Any, add_mark: bool = True) -> int:
+        """Memoized UserBotClient.get_peer_id for this update."""
+        try:
+            key = ('peer_id', peer, add_mark)
+            hash(key)
+        except TypeError:
+            # TLObjects aren't hashable, keep them alive and use their ID
+            self._refs.append(peer)
+            key = ('peer_id', id(peer), add_mark)
+        return await self._once(
+            key, lambda: self.client.get_peer_id(peer, add_mark)
+        )
+
+    async def _get_input_users(self) -> list:
+        # ChatAction.get_input_users always reloads the action message
+        users = self.event.input_users
+        if len(users) != len(self.event.user_ids or ()):
+            users = await self.event.get_input_users()
+        return users
+
+    async def _once(
+        self, key: Hashable, factory: Callable[[], Awaitable]
+    ) -> Any:
+        task = self._tasks.get(key, None)
+        if task is None:
+            self.stats['fetched'] += 1
+            task = self.client.loop.create_task(factory())
+            self._tasks[key] = task
+        else:
+            self.stats['shared'] += 1
+        return await asyncio.shield(task)
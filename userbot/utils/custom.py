@@ -15,19 +15,23 @@
 # along with TG-UserBot.  If not, see <https://www.gnu.org/licenses/>.
 
 
-import asyncio
+import copy
 import datetime
 import io
 import logging
-from typing import Sequence, Tuple, Union
+from typing import Iterator, Sequence, Tuple, Union
 
 from telethon import errors
 from telethon.extensions import markdown, html
-from telethon.tl import custom, functions, types
+from telethon.helpers import add_surrogate, del_surrogate
+from telethon.tl import custom, types
+
+from .cache import LRUCache
 
 
 LOGGER = logging.getLogger(__name__)
 MAXLIM: int = 4096
+recently_sent = LRUCache(maxsize=256)
 
 
 async def answer(
@@ -41,11 +45,10 @@ async def answer(
     """Custom bound method for the Message object"""
     message_out = None
     start_date = datetime.datetime.now(datetime.timezone.utc)
-    message = await self.client.get_messages(
-        await self.get_input_chat(), ids=self.id
-    )
+    out = self.out or (self.chat_id, self.id) in recently_sent
     reply_to = self.reply_to_msg_id or self.id
-    if kwargs.setdefault('parse_mode', 'md') in ['html', 'HTML']:
+    parse_mode = kwargs.setdefault('parse_mode', 'md')
+    if parse_mode in ['html', 'HTML']:
         parser = html
     else:
         parser = markdown
@@ -53,10 +56,14 @@ async def answer(
     if len(args) == 1 and isinstance(args[0], str):
         is_reply = reply or kwargs.get('reply_to', False)
         text = args[0]
-        msg, msg_entities = parser.parse(text)
+        if parse_mode:
+            msg, msg_entities = parser.parse(text)
+        else:
+            msg, msg_entities = text, []
+        kwargs['parse_mode'] = ParsedText(msg_entities, parser)
         if len(msg) <= MAXLIM:
             if (
-                not (message and message.out) or is_reply or self.fwd_from or
+                not out or is_reply or self.fwd_from or
                 (self.media and not isinstance(
                     self.media, types.MessageMediaWebPage
                 ))
@@ -64,22 +71,24 @@ async def answer(
                 kwargs.setdefault('reply_to', reply_to)
                 try:
                     kwargs.setdefault('silent', True)
-                    message_out = await self.respond(text, **kwargs)
+                    message_out = await self.respond(msg, **kwargs)
                 except Exception as e:
                     raise e
             else:
                 if len(msg_entities) > 100:
-                    messages = await _resolve_entities(msg, msg_entities)
-                    chunks = [parser.unparse(t, e) for t, e in messages]
+                    chunks = split_message(msg, msg_entities)
+                    first, entities = next(chunks)
+                    kwargs['parse_mode'] = ParsedText(entities, parser)
                     message_out = []
                     try:
-                        first_msg = await self.edit(chunks[0], **kwargs)
+                        first_msg = await self.edit(first, **kwargs)
                     except errors.rpcerrorlist.MessageIdInvalidError:
-                        first_msg = await self.respond(chunks[0], **kwargs)
+                        first_msg = await self.respond(first, **kwargs)
                     except Exception as e:
                         raise e
                     message_out.append(first_msg)
-                    for t in chunks[1:]:
+                    for t, entities in chunks:
+                        kwargs['parse_mode'] = ParsedText(entities, parser)
                         try:
                             kwargs.setdefault('silent', True)
                             sent = await self.respond(t, **kwargs)
@@ -88,16 +97,13 @@ async def answer(
                             raise e
                 else:
                     try:
-                        message_out = await self.edit(text, **kwargs)
+                        message_out = await self.edit(msg, **kwargs)
                     except errors.rpcerrorlist.MessageIdInvalidError:
-                        message_out = await self.respond(text, **kwargs)
+                        message_out = await self.respond(msg, **kwargs)
                     except Exception as e:
                         raise e
         else:
-            if (
-                message and message.out and
-                not (message.fwd_from or message.media)
-            ):
+            if out and not (self.fwd_from or self.media):
                 try:
                     await self.edit("`Output exceeded the limit.`")
                 except errors.rpcerrorlist.MessageIdInvalidError:
@@ -106,6 +112,7 @@ async def answer(
                     raise e
 
             kwargs.setdefault('reply_to', reply_to)
+            kwargs['parse_mode'] = parse_mode
             output = io.BytesIO(msg.strip().encode())
             output.name = "output.txt"
             try:
@@ -130,10 +137,12 @@ async def answer(
         if isinstance(message_out, list):
             for message in message_out:
                 message.date = start_date
+                recently_sent.set((message.chat_id, message.id), True)
         else:
             message_out.date = start_date
-    if self_destruct:
-        asyncio.create_task(_self_destructor(message_out, self_destruct))
+            recently_sent.set((message_out.chat_id, message_out.id), True)
+    if message_out and self_destruct:
+        self.client.self_destructs.schedule(message_out, self_destruct)
 
     if log:
         if isinstance(log, tuple):
@@ -143,129 +152,78 @@ async def answer(
                 text += f"\n{extra}"
         else:
             text = f"**USERBOT LOG** `Executed command:` #{log}"
-        if self.client.logger:
-            logger_group = self.client.config['userbot'].getint(
-                'logger_group_id', False
-            )
-            entity = False
-            try:
-                entity = await self.client.get_input_entity(logger_group)
-            except TypeError:
-                LOGGER.info("Your logger group ID is unsupported")
-            except ValueError:
-                LOGGER.info("Your logger group ID cannot be found")
-            except Exception as e:
-                raise e
-
-            if entity:
-                message, msg_entities = await self.client._parse_message_text(
-                    text, kwargs.get('parse_mode')
-                )
-                if len(message) <= MAXLIM and len(msg_entities) < 100:
-                    messages = [(message, msg_entities)]
-                else:
-                    messages = await _resolve_entities(message, msg_entities)
-                for text, entities in messages:
-                    try:
-                        await self.client(
-                            functions.messages.SendMessageRequest(
-                                peer=entity,
-                                message=text,
-                                no_webpage=True,
-                                silent=True,
-                                entities=entities
-                            )
-                        )
-                        await asyncio.sleep(2)
-                    except Exception as e:
-                        print("Report this error to the support group.")
-                        raise e
+        self.client.log_sink.put(text, parse_mode)
     return message_out
 
 
-async def _resolve_entities(message: str, entities: list) -> dict:
-    """Don't even bother trying to figure this mess out"""
-    messages = []
-    while entities:
-        end = 100 if len(entities) >= 100 else len(entities)
-        if len(message) > MAXLIM:
-            end, _ = min(
-                enumerate(entities[:end]),
-                key=lambda x: abs(x[1].offset + x[1].length - MAXLIM)
+class ParsedText:
+    """Parse mode which hands already parsed text and entities to Telethon"""
+    def __init__(self, entities: list, parser=markdown):
+        self.entities = entities
+        self.parser = parser
+
+    def parse(self, text: str) -> Tuple[str, list]:
+        return text, list(self.entities)
+
+    def unparse(self, text: str, entities: list) -> str:
+        return self.parser.unparse(text, entities)
+
+
+def split_message(
+    message: str, entities: list,
+    limit: int = MAXLIM, max_entities: int = 100
+) -> Iterator[Tuple[str, list]]:
+    """Split a parsed message into chunks Telegram accepts, in one pass.
+
+    Chunks are yielded as soon as they're ready. Cuts are made after the
+    last newline of a chunk when possible and entities which are cut are
+    split between both of the chunks. Where more entities overlap than a
+    chunk can hold, the ones which start last lose their formatting there.
+    """
+    text = add_surrogate(message)
+    entities = sorted(entities, key=lambda e: e.offset)
+    total = len(text)
+    start = 0
+    index = 0
+    carried = []
+
+    while start < total:
+        end = min(start + limit, total)
+        available = max_entities - len(carried)
+        if (
+            available > 0 and index + available < len(entities) and
+            entities[index + available].offset < end
+        ):
+            end = max(entities[index + available].offset, start + 1)
+        elif end < total:
+            newline = text.rfind('\n', start, end)
+            if newline > start:
+                end = newline + 1
+        if end < total and '\ud800' <= text[end - 1] <= '\udbff':
+            end += -1 if end - 1 > start else 1  # Keep surrogate pairs
+
+        chunk_entities = []
+        remaining = []
+        while index < len(entities) and entities[index].offset < end:
+            carried.append(entities[index])
+            index += 1
+        for entity in carried:
+            offset = max(entity.offset, start)
+            length = min(entity.offset + entity.length, end) - offset
+            if length > 0:
+                chunk_entity = copy.copy(entity)
+                chunk_entity.offset = offset - start
+                chunk_entity.length = length
+                chunk_entities.append(chunk_entity)
+            if entity.offset + entity.length > end:
+                remaining.append(entity)
+        if len(chunk_entities) > max_entities:
+            LOGGER.debug(
+                "Dropping %d overlapping entities of a chunk.",
+                len(chunk_entities) - max_entities
             )
-            if end == 0:
-                msg_end = entities[0].offset + entities[0].length
-                if msg_end > MAXLIM:
-                    entity_type = getattr(types, type(entities[0]).__name__)
-                    kwargs = vars(entities[0])
-                    kwargs.update(offset=0)
-                    for i in range(0, msg_end, MAXLIM):
-                        end = i+MAXLIM if i+MAXLIM <= msg_end else msg_end
-                        m_chunk = message[i:end]
-                        kwargs.update(length=len(m_chunk))
-                        messages.append((m_chunk, [entity_type(**kwargs)]))
-                else:
-                    messages.append((message[:msg_end], [entities[0]]))
-                next_offset, _ = await _next_offset(1, entities)
-                del entities[0]
-                message = message[msg_end:]
-                await _reset_entities(entities, msg_end, next_offset)
-                continue
-            end = end + 1  # We don't want the index
-
-        _, last_chunk = await _next_offset(end, entities)
-        if not last_chunk:
-            last_end = entities[end+1].offset + entities[end+1].length
-            if end > 3 and not message[last_end:].startswith('\n'):
-                for e in entities[:end:-1]:
-                    start = e.offset + e.length
-                    end = end - 1
-                    if end == 2 or message[start:].startswith('\n'):
-                        break
-        e_chunk = entities[:end]
-        next_offset, last_chunk = await _next_offset(end, entities)
-        if last_chunk:
-            msg_end = len(message) + 1
-        else:
-            msg_end = e_chunk[-1].offset + e_chunk[-1].length
-        t_chunk = message[:msg_end]
-        messages.append((t_chunk, e_chunk))
-        entities = entities[end:]
-        message = message[len(t_chunk):]
-        if entities:
-            await _reset_entities(entities, msg_end, next_offset)
-    return messages
-
-
-async def _reset_entities(entities: list, end: int, next_offset: int) -> None:
-    """Reset the offset of entities's list which has been cut"""
-    offset = entities[0].offset
-    increment = 0 if next_offset == end else next_offset - end
-    for entity in entities:
-        entity.offset = entity.offset + increment - offset
+            del chunk_entities[max_entities:]
 
-
-async def _next_offset(end, entities) -> Tuple[int, bool]:
-    """Find out how much length we need to skip ahead for the next entities"""
-    last_chunk = False
-    if len(entities) >= end+1:
-        next_offset = entities[end].offset
-    else:
-        # It's always the last entity so just grab the last index
-        next_offset = entities[-1].offset + entities[-1].length
-        last_chunk = True
-    return next_offset, last_chunk
-
-
-async def _self_destructor(
-    event: Union[custom.Message, Sequence[custom.Message]],
-    timeout: int or float
-) -> Union[custom.Message, Sequence[custom.Message]]:
-    await asyncio.sleep(timeout)
-    if isinstance(event, list):
-        deleted = []
-        for e in event:
-            deleted.append(await e.delete())
-    else:
-        deleted = await event.delete()
-    return deleted
+        yield del_surrogate(text[start:end]), chunk_entities
+        carried = remaining
+        start = end
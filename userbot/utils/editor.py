@@ -0,0 +1,111 @@
+# TG-UserBot - A modular Telegram UserBot script for Python.
+# Copyright (C) 2019  Kandarp <https://github.com/kandnub>
+#
+# TG-UserBot is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# TG-UserBot is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with TG-UserBot.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import asyncio
+import logging
+import time
+import weakref
+from typing import Dict, Tuple
+
+from telethon import errors
+from telethon.tl import custom
+
+
+LOGGER = logging.getLogger(__name__)
+EDIT_INTERVAL: int = 5
+
+
+class EditScheduler:
+    """Coalesce the edits of a message and only send the latest text.
+
+    Edits in the same chat are spaced by at least ``interval`` seconds and
+    FloodWaitErrors push the next edit of the chat back instead of failing.
+    Intermediate texts which are replaced before they're sent are dropped.
+    """
+    schedulers: Dict[Tuple[int, int], 'EditScheduler'] = (
+        weakref.WeakValueDictionary()
+    )
+    next_edit: Dict[int, float] = {}
+
+    def __init__(self, event: custom.Message, interval: int = EDIT_INTERVAL):
+        self.event = event
+        self.interval = interval
+        self.sent: int = 0
+        self.dropped: int = 0
+        self._pending: Tuple[tuple, dict] = None
+        self._task: asyncio.Task = None
+
+    @classmethod
+    def get(cls, event: custom.Message) -> 'EditScheduler':
+        """Get the scheduler of a message, creating it if needed."""
+        key = (event.chat_id, event.id)
+        scheduler = cls.schedulers.get(key, None)
+        if scheduler is None:
+            scheduler = cls(event)
+            cls.schedulers[key] = scheduler
+        return scheduler
+
+    @classmethod
+    def pending(cls) -> int:
+        """The number of messages with an edit which hasn't been sent."""
+        return sum(
+            1 for s in list(cls.schedulers.values()) if s._pending is not None
+        )
+
+    def edit(self, *args, **kwargs) -> None:
+        """Replace the pending edit and make sure it will be sent."""
+        if self._pending is not None:
+            self.dropped += 1
+        self._pending = (args, kwargs)
+        if not self._task or self._task.done():
+            self._task = self.event.client.loop.create_task(self._worker())
+
+    async def flush(self, *args, **kwargs) -> custom.Message:
+        """Schedule an optional last edit and wait until it has been sent."""
+        if args or kwargs:
+            self.edit(*args, **kwargs)
+        if self._task:
+            await asyncio.shield(self._task)
+        return self.event
+
+    async def _worker(self) -> None:
+        chat = self.event.chat_id
+        while self._pending is not None:
+            delay = self.next_edit.get(chat, 0) - time.monotonic()
+            while delay > 0:
+                await asyncio.sleep(delay)
+                delay = self.next_edit.get(chat, 0) - time.monotonic()
+
+            args, kwargs = self._pending
+            self._pending = None
+            try:
+                result = await self.event.answer(*args, **kwargs)
+                if isinstance(result, list):
+                    result = result[0]
+                if result:
+                    self.event = result
+                self.sent += 1
+                self.next_edit[chat] = time.monotonic() + self.interval
+            except errors.FloodWaitError as e:
+                LOGGER.debug("Delaying edits in %s by %ds.", chat, e.seconds)
+                self.next_edit[chat] = time.monotonic() + e.seconds
+                if self._pending is None:
+                    self._pending = (args, kwargs)
+            except errors.MessageNotModifiedError:
+                pass
+            except Exception as e:
+                LOGGER.exception(e)
@@ -15,16 +15,25 @@
 # along with TG-UserBot.  If not, see <https://www.gnu.org/licenses/>.
 
 
-import re
-from typing import Tuple
+import functools
+from collections import Counter
+from typing import Callable, Dict, Tuple
 
 from telethon import events
-from telethon.tl import custom, functions, types
+from telethon.tl import custom, types
 
+from .cache import LRUCache
 from .custom import answer
+from .router import CommandRouter
 
 
 custom.Message.answer = answer
+router = CommandRouter()
+dispatch_stats: Counter = Counter()
+handler_stats: Dict[str, Counter] = {}
+seen_texts = LRUCache(maxsize=2048)
+EDIT_UPDATES = (types.UpdateEditMessage, types.UpdateEditChannelMessage)
+ADMIN_TEXT = "`You need to be an admin to use this command!`"
 
 
 @events.common.name_inner_event
@@ -33,7 +42,10 @@ class NewMessage(events.NewMessage):
 
     def __init__(
         self,
+        condition: Callable[['NewMessage.Event'], bool] = None,
         disable_prefix: bool = None,
+        edited: bool = False,
+        private: bool = None,
         regex: Tuple[str, int] or str = None,
         require_admin: bool = None,
         **kwargs
@@ -56,39 +68,72 @@ class NewMessage(events.NewMessage):
         else:
             self.regex = regex
 
+        self.condition = condition
         self.disable_prefix = disable_prefix
+        self.edited = edited
+        self.private = private
         self.require_admin = require_admin
+        self.stats: Counter = Counter()
+        dispatch_stats['handlers'] += 1
+        if edited:
+            dispatch_stats['edited_handlers'] += 1
+        if self.regex:
+            router.add(self)
+
+    @classmethod
+    def build(cls, update, others=None, self_id=None):
+        """Classify the update once, as a new or an edited message"""
+        if isinstance(update, EDIT_UPDATES):
+            message = update.message
+            key = _message_key(message)
+            text = getattr(message, 'message', None)
+            if key in seen_texts and seen_texts.get(key) == text:
+                dispatch_stats['unchanged_edits'] += 1
+                dispatch_stats['skipped_filters'] += (
+                    dispatch_stats['edited_handlers']
+                )
+                return
+            seen_texts.set(key, text)
+            dispatch_stats['edited'] += 1
+            event = MessageEdited.Event(message)
+        else:
+            event = super().build(update, others, self_id)
+            if not event:
+                return
+            seen_texts.set(_message_key(event.message), event.message.message)
+            dispatch_stats['new'] += 1
+
+        # Each command used to have a second MessageEdited builder
+        dispatch_stats['skipped_builders'] += (
+            dispatch_stats['edited_handlers']
+        )
+        return event
 
     def filter(self, event):
         """Overriding the default filter to check additional values"""
+        if not self.edited and isinstance(event, MessageEdited.Event):
+            return
+
         event = super().filter(event)
         if not event:
             return
 
-        if event._client.prefix:
-            prefix = re.escape(event._client.prefix)
-        else:
-            prefix = r"[^/!#@\$A-Za-z0-9]"
+        if self.private is not None and event.is_private != self.private:
+            self.stats['short_circuited'] += 1
+            return
+        if self.condition and not self.condition(event):
+            self.stats['short_circuited'] += 1
+            return
 
         if self.regex:
-            exp, flags = self.regex
-
-            if not self.disable_prefix:
-                pattern = re.compile(
-                    "(?i)^" + prefix + exp,
-                    flags=flags
-                ).finditer
-            else:
-                pattern = re.compile(exp, flags=flags).finditer
-
             text = event.message.message or ''
-            matches = list(pattern(text)) or None
+            matches = router.match(self, event._client.prefix, text)
             if not matches:
                 return
             event.matches = matches
 
         if self.require_admin:
-            text = "`You need to be an admin to use this command!`"
+            text = ADMIN_TEXT
             if not isinstance(event._chat_peer, types.PeerUser):
                 is_creator = False
                 is_admin = False
@@ -100,23 +145,12 @@ class NewMessage(events.NewMessage):
                     )
 
                 if self.incoming:
-                    try:
-                        p = event._client.loop.create_task(
-                            event._client(
-                                functions.channels.GetParticipantRequest(
-                                    channel=event.chat_id,
-                                    user_id=event.sender_id
-                                )
-                            )
-                        )
-                        participant = p.participant
-                    except Exception:
-                        participant = None
-                    if isinstance(
-                        participant, types.ChannelParticipantCreator
-                    ):
-                        is_creator = True
-                    if isinstance(participant, types.ChannelParticipantAdmin):
+                    is_admin = event._client.admins.get(
+                        event.chat_id, event.sender_id
+                    )
+                    if is_admin is None:
+                        # Not cached yet, the handler awaits the roster
+                        event._check_admin = True
                         is_admin = True
                 else:
                     is_creator = event.chat.creator
@@ -133,6 +167,7 @@ class NewMessage(events.NewMessage):
                                 event.answer(text, reply=True)
                             )
                         return
+        self.stats['invoked'] += 1
         return event
 
 
@@ -140,13 +175,38 @@ class NewMessage(events.NewMessage):
 class MessageEdited(NewMessage):
     """Custom MessageEdited event inheriting the custom NewMessage event"""
 
+    def __init__(self, *args, edited: bool = True, **kwargs):
+        super().__init__(*args, edited=edited, **kwargs)
+
     @classmethod
     def build(cls, update, others=None, self_id=None):
         """Required to check if message is edited, double events"""
-        if isinstance(update, (types.UpdateEditMessage,
-                               types.UpdateEditChannelMessage)):
+        if isinstance(update, EDIT_UPDATES):
             return cls.Event(update.message)
 
     class Event(NewMessage.Event):
         """Overriding the default Event which inherits Telethon's NewMessage"""
         pass  # Required if we want a different name for it
+
+
+def check_admin(func: callable) -> callable:
+    """Await the admin check of events the filter couldn't check yet"""
+    @functools.wraps(func)
+    async def wrapper(event):
+        if getattr(event, '_check_admin', False):
+            # The filter's lookup was already counted as a miss
+            is_admin = await event.client.admins.is_admin(
+                event.chat_id, event.sender_id, count=False
+            )
+            if not is_admin:
+                await event.answer(ADMIN_TEXT, reply=True)
+                return
+        return await func(event)
+
+    return wrapper
+
+
+def _message_key(message: types.Message) -> Tuple[int, int]:
+    """Private chat and group message IDs are unique to the account"""
+    peer = getattr(message, 'peer_id', None) or message.to_id
+    return getattr(peer, 'channel_id', 0), message.id
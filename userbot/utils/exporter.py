@@ -0,0 +1,354 @@
+# TG-UserBot - A modular Telegram UserBot script for Python.
+# Copyright (C) 2019  Kandarp <https://github.com/kandnub>
+#
+# TG-UserBot is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# TG-UserBot is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with TG-UserBot.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import asyncio
+import logging
+import os
+import sys
+import time
+from typing import Dict, List
+
+from telethon import TelegramClient
+
+from .context import UpdateContext
+from .editor import EditScheduler
+from .events import dispatch_stats
+from .metrics import LATENCY_BUCKETS
+from .sessions import RedisSession
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+LOGGER = logging.getLogger(__name__)
+DEFAULT_HOST: str = '127.0.0.1'
+CONTENT_TYPE: str = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class MetricsExporter:
+    """Serve the bot's metrics over HTTP in the Prometheus text format.
+
+    The server is only started if ``metrics_port`` is set in the config.
+    """
+    def __init__(self, client: TelegramClient):
+        self.client = client
+        config = client.config['userbot']
+        self.host = config.get('metrics_host', DEFAULT_HOST)
+        self.port = config.getint('metrics_port', 0)
+        self.server: asyncio.AbstractServer = None
+
+    async def start(self) -> None:
+        """Start listening if the exporter is enabled."""
+        if not self.port:
+            return
+        try:
+            self.server = await asyncio.start_server(
+                self._handle, self.host, self.port
+            )
+            LOGGER.info(
+                "Serving the metrics on http://%s:%d/metrics",
+                self.host, self.port
+            )
+        except OSError as e:
+            LOGGER.error("Couldn't start the metrics exporter: %s", e)
+
+    async def render(self) -> str:
+        """Render all the metrics in the text exposition format."""
+        lines: List[str] = []
+        self._handler_metrics(lines)
+        self._dispatch_metrics(lines)
+        self._request_metrics(lines)
+        watchdog = self.client.watchdog
+        self._gauge(lines, 'userbot_loop_lag_seconds', (
+            "How late the event loop woke up the watchdog last time."
+        ), watchdog.lag)
+        self._gauge(lines, 'userbot_loop_max_lag_seconds', (
+            "The highest event loop lag since the start."
+        ), watchdog.max_lag)
+        _help(
+            lines, 'userbot_loop_stalls_total',
+            "Times the loop lagged by more than the threshold.", 'counter'
+        )
+        lines.append(_sample('userbot_loop_stalls_total', {}, watchdog.stalls))
+        _help(lines, 'userbot_queue_depth', "Pending items.", 'gauge')
+        queues = {
+            'logs': self.client.log_sink.pending,
+            'self_destructs': self.client.self_destructs.pending,
+            'edits': EditScheduler.pending(),
+        }
+        for queue, depth in queues.items():
+            lines.append(
+                _sample('userbot_queue_depth', {'queue': queue}, depth)
+            )
+        _help(
+            lines, 'userbot_transfer_bytes_total',
+            "Bytes transferred by FastTelethon.", 'counter'
+        )
+        _help(
+            lines, 'userbot_transfer_seconds_total',
+            "Seconds spent transferring files with FastTelethon.", 'counter'
+        )
+        transfers = self.client.metrics.transfers
+        for direction in ('download', 'upload'):
+            labels = {'direction': direction}
+            lines.append(_sample(
+                'userbot_transfer_bytes_total', labels,
+                transfers[direction + '_bytes']
+            ))
+            lines.append(_sample(
+                'userbot_transfer_seconds_total', labels,
+                transfers[direction + '_seconds']
+            ))
+        _help(
+            lines, 'userbot_upload_cache_total',
+            "Sent-file cache lookups of fast uploads.", 'counter'
+        )
+        for result in ('hits', 'misses'):
+            lines.append(_sample(
+                'userbot_upload_cache_total', {'result': result[:-1]},
+                transfers['upload_cache_' + result]
+            ))
+        _help(
+            lines, 'userbot_upload_cache_bytes_total',
+            "Bytes which didn't have to be uploaded again.", 'counter'
+        )
+        lines.append(_sample(
+            'userbot_upload_cache_bytes_total', {},
+            transfers['upload_cache_bytes']
+        ))
+        _help(
+            lines, 'userbot_admin_cache_total',
+            "Admin roster lookups of the require_admin checks.", 'counter'
+        )
+        admins = self.client.admins
+        for result, count in (('hit', admins.hits), ('miss', admins.misses)):
+            lines.append(_sample(
+                'userbot_admin_cache_total', {'result': result}, count
+            ))
+        _help(
+            lines, 'userbot_update_entity_lookups_total',
+            "Entity lookups of the update contexts, shared ones saved an RPC.",
+            'counter'
+        )
+        for result in ('fetched', 'shared'):
+            lines.append(_sample(
+                'userbot_update_entity_lookups_total', {'result': result},
+                UpdateContext.stats[result]
+            ))
+        rtt = await self._redis_rtt()
+        if rtt is not None:
+            self._gauge(
+                lines, 'userbot_redis_rtt_seconds',
+                "Round-trip time of a Redis PING.", rtt
+            )
+        self._memory_metrics(lines)
+        return '\n'.join(lines) + '\n'
+
+    def _handler_metrics(self, lines: List[str]) -> None:
+        handlers = self.client.metrics.handlers.values()
+        _help(
+            lines, 'userbot_handler_calls_total', "Handler calls.", 'counter'
+        )
+        for h in handlers:
+            lines.append(_sample(
+                'userbot_handler_calls_total', {'handler': h.name}, h.calls
+            ))
+        _help(
+            lines, 'userbot_handler_errors_total',
+            "Handler calls which raised an error.", 'counter'
+        )
+        for h in handlers:
+            lines.append(_sample(
+                'userbot_handler_errors_total', {'handler': h.name}, h.errors
+            ))
+        _help(
+            lines, 'userbot_handler_latency_seconds',
+            "Latency of the recent handler calls.", 'summary'
+        )
+        for h in handlers:
+            for quantile in (50, 95, 99):
+                lines.append(_sample(
+                    'userbot_handler_latency_seconds',
+                    {'handler': h.name, 'quantile': str(quantile / 100)},
+                    h.percentile(quantile)
+                ))
+            labels = {'handler': h.name}
+            lines.append(_sample(
+                'userbot_handler_latency_seconds_sum', labels, h.total_time
+            ))
+            lines.append(_sample(
+                'userbot_handler_latency_seconds_count', labels, h.calls
+            ))
+
+    def _dispatch_metrics(self, lines: List[str]) -> None:
+        _help(
+            lines, 'userbot_dispatched_messages_total',
+            "New and edited messages by how they were dispatched.", 'counter'
+        )
+        kinds = (
+            ('new', 'new'), ('edited', 'edited'),
+            ('unchanged_edit', 'unchanged_edits')
+        )
+        for kind, key in kinds:
+            lines.append(_sample(
+                'userbot_dispatched_messages_total', {'kind': kind},
+                dispatch_stats[key]
+            ))
+        _help(
+            lines, 'userbot_skipped_filters_total',
+            "Handler filter calls saved by skipping unchanged edits.",
+            'counter'
+        )
+        lines.append(_sample(
+            'userbot_skipped_filters_total', {},
+            dispatch_stats['skipped_filters']
+        ))
+
+    def _request_metrics(self, lines: List[str]) -> None:
+        requests = self.client.metrics.requests.values()
+        _help(
+            lines, 'userbot_rpc_latency_seconds',
+            "Latency of the sent requests.", 'histogram'
+        )
+        for r in requests:
+            count = 0
+            for bound, bucket in zip(LATENCY_BUCKETS, r.buckets):
+                count += bucket
+                le = '+Inf' if bound == float('inf') else str(bound)
+                lines.append(_sample(
+                    'userbot_rpc_latency_seconds_bucket',
+                    {'request': r.name, 'le': le}, count
+                ))
+            labels = {'request': r.name}
+            lines.append(_sample(
+                'userbot_rpc_latency_seconds_sum', labels, r.total_time
+            ))
+            lines.append(_sample(
+                'userbot_rpc_latency_seconds_count', labels, r.calls
+            ))
+        counters = (
+            ('userbot_rpc_errors_total', 'errors', "Failed requests."),
+            (
+                'userbot_rpc_flood_waits_total', 'flood_waits',
+                "Requests which raised a FloodWaitError."
+            ),
+            (
+                'userbot_rpc_flood_wait_seconds_total', 'flood_seconds',
+                "Seconds of the raised FloodWaitErrors."
+            ),
+        )
+        for name, attr, text in counters:
+            _help(lines, name, text, 'counter')
+            for r in requests:
+                lines.append(_sample(
+                    name, {'request': r.name}, getattr(r, attr)
+                ))
+
+    def _memory_metrics(self, lines: List[str]) -> None:
+        rss = _current_rss()
+        if rss is not None:
+            self._gauge(
+                lines, 'userbot_memory_rss_bytes',
+                "Resident memory of the process.", rss
+            )
+        if resource:
+            max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            if sys.platform != 'darwin':
+                max_rss *= 1024
+            self._gauge(
+                lines, 'userbot_memory_max_rss_bytes',
+                "Peak resident memory of the process.", max_rss
+            )
+
+    @staticmethod
+    def _gauge(lines: List[str], name: str, text: str, value: float) -> None:
+        _help(lines, name, text, 'gauge')
+        lines.append(_sample(name, {}, value))
+
+    async def _redis_rtt(self) -> float:
+        if not isinstance(self.client.session, RedisSession):
+            return None
+        redis = self.client.session.redis_connection
+        try:
+            return await self.client.loop.run_in_executor(None, _ping, redis)
+        except Exception as e:
+            LOGGER.debug("Couldn't ping Redis: %s", e)
+            return None
+
+    async def _handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            request = await asyncio.wait_for(reader.readline(), 10)
+            while (await asyncio.wait_for(reader.readline(), 10)).strip():
+                pass
+            parts = request.decode('latin-1').split()
+            if len(parts) >= 2 and parts[0] == 'GET' and (
+                parts[1].split('?')[0] in ('/', '/metrics')
+            ):
+                status = '200 OK'
+                body = (await self.render()).encode()
+            else:
+                status = '404 Not Found'
+                body = b'Not Found\n'
+            writer.write(
+                f"HTTP/1.1 {status}\r\n"
+                f"Content-Type: {CONTENT_TYPE}\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                "Connection: close\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+        except Exception as e:
+            LOGGER.debug("Couldn't serve the metrics: %s", e)
+        finally:
+            writer.close()
+
+
+def _help(lines: List[str], name: str, text: str, kind: str) -> None:
+    lines.append(f"# HELP {name} {text}")
+    lines.append(f"# TYPE {name} {kind}")
+
+
+def _sample(name: str, labels: Dict[str, str], value: float) -> str:
+    if labels:
+        label = ','.join(
+            f'{key}="{_escape(str(val))}"' for key, val in labels.items()
+        )
+        return f"{name}{{{label}}} {value}"
+    return f"{name} {value}"
+
+
+def _escape(value: str) -> str:
+    return (
+        value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    )
+
+
+def _ping(redis) -> float:
+    start = time.perf_counter()
+    redis.ping()
+    return time.perf_counter() - start
+
+
+def _current_rss() -> int:
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
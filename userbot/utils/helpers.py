@@ -32,6 +32,7 @@ from telethon.tl import types
 from telethon.utils import get_display_name
 
 from .client import UserBotClient
+from .editor import EditScheduler
 from .log_formatter import CEND, CUSR
 from .events import NewMessage
 from userbot.plugins import plugins_data
@@ -97,6 +98,10 @@ def resolve_env(config: configparser.ConfigParser):
         'console_logger_level': os.getenv('console_logger_level', None),
         'logger_group_id': os.getenv('logger_group_id', None),
         'userbot_prefix': os.getenv('userbot_prefix', None),
+        'metrics_host': os.getenv('metrics_host', None),
+        'metrics_port': os.getenv('metrics_port', None),
+        'loop_debug': bool(os.getenv('loop_debug', None)),
+        'loop_lag_threshold': os.getenv('loop_lag_threshold', None),
         'default_sticker_pack': os.getenv('default_sticker_pack', None),
         'default_animated_sticker_pack': os.getenv(
             'default_animated_sticker_pack', None
@@ -180,6 +185,8 @@ def restarter(client: UserBotClient) -> None:
         os.environ['userbot_disabled_commands'] = disabled_list
     if os.environ.get('userbot_afk', False):
         plugins_data.dump_AFK()
+    client.self_destructs.dump()
+    client.metrics.dump()
     client._kill_running_processes()
 
     if sys.platform.startswith('win'):
@@ -192,6 +199,7 @@ async def restart(event: NewMessage.Event) -> None:
     event.client.reconnect = False
     restart_message = f"{event.chat_id}/{event.message.id}"
     os.environ['userbot_restarted'] = restart_message
+    await event.client.log_sink.flush()
     restarter(event.client)
     if event.client.is_connected():
         await event.client.disconnect()
@@ -362,7 +370,7 @@ def dl_progress(d: dict, event) -> Tuple[Union[str, bool], bool]:
 class ProgressCallback():
     """Custom class to handle upload and download progress."""
     def __init__(self, event, start=None, filen='unamed'):
-        self.event = event
+        self.editor = EditScheduler.get(event)
         self.start = start or time.time()
         self.last_edit = None
         self.filen = filen
@@ -390,16 +398,21 @@ class ProgressCallback():
             'speed': f'{s0:.2f}{s1}{s2[0]}/s'
         }
 
+    @property
+    def event(self):
+        """The latest message of the progress edits."""
+        return self.editor.event
+
     async def up_progress(self, current, total):
         """Handle the upload progress only."""
         d = await self.resolve_prog(current, total)
         edit, finished = ul_progress(d, self.event)
         if finished:
             if not self.upload_finished:
-                self.event = await self.event.answer(edit)
                 self.upload_finished = True
+                await self.editor.flush(edit)
         elif edit:
-            self.event = await self.event.answer(edit)
+            self.editor.edit(edit)
 
     async def dl_progress(self, current, total):
         """Handle the download progress only."""
@@ -407,7 +420,7 @@ class ProgressCallback():
         edit, finished = dl_progress(d, self.event)
         if finished:
             if not self.download_finished:
-                self.event = await self.event.answer(edit)
                 self.download_finished = True
+                await self.editor.flush(edit)
         elif edit:
-            self.event = await self.event.answer(edit)
+            self.editor.edit(edit)
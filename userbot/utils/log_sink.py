@@ -0,0 +1,160 @@
+# TG-UserBot - A modular Telegram UserBot script for Python.
+# Copyright (C) 2019  Kandarp <https://github.com/kandnub>
+#
+# TG-UserBot is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# TG-UserBot is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with TG-UserBot.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import asyncio
+import logging
+from typing import List, Tuple
+
+from telethon import errors, TelegramClient
+from telethon.helpers import add_surrogate
+from telethon.tl import functions
+
+from .custom import MAXLIM, split_message
+
+
+LOGGER = logging.getLogger(__name__)
+LOG_DELAY: int = 2
+FLUSH_TIMEOUT: int = 10
+SEPARATOR: str = "\n\n"
+
+
+class LoggerSink:
+    """Send the logs to the logger group from a single background task.
+
+    Logs which are queued while a message is being sent are batched into
+    as few messages as possible and the logger group's peer is resolved once.
+    """
+    def __init__(self, client: TelegramClient, delay: int = LOG_DELAY):
+        self.client = client
+        self.delay = delay
+        self.entity = None
+        self.sent: int = 0
+        self.queued: int = 0
+        self._queue: asyncio.Queue = None
+        self._task: asyncio.Task = None
+
+    def put(self, text: str, parse_mode: str = 'md') -> None:
+        """Queue a log without waiting for it to be sent."""
+        if not self.client.logger:
+            return
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        self._queue.put_nowait((text, parse_mode))
+        self.queued += 1
+        if not self._task or self._task.done():
+            self._task = self.client.loop.create_task(self._worker())
+
+    @property
+    def pending(self) -> int:
+        """The number of logs which haven't been sent yet."""
+        return self._queue.qsize() if self._queue else 0
+
+    async def flush(self, timeout: int = FLUSH_TIMEOUT) -> None:
+        """Wait until all the queued logs have been sent."""
+        if not self._queue:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            LOGGER.warning(
+                "Dropped %d logs which couldn't be sent in time.",
+                self._queue.qsize()
+            )
+
+    async def _worker(self) -> None:
+        while True:
+            items = [await self._queue.get()]
+            while not self._queue.empty():
+                items.append(self._queue.get_nowait())
+            try:
+                await self._send_batch(items)
+            except Exception as e:
+                LOGGER.exception(e)
+            finally:
+                for _ in items:
+                    self._queue.task_done()
+            await asyncio.sleep(self.delay)
+
+    async def _send_batch(self, items: List[Tuple[str, str]]) -> None:
+        if not await self._get_entity():
+            return
+
+        batch = []
+        length = 0
+        count = 0
+        for text, parse_mode in items:
+            message, entities = await self.client._parse_message_text(
+                text, parse_mode
+            )
+            size = len(add_surrogate(message))
+            if batch and (
+                length + size > MAXLIM or count + len(entities) >= 100
+            ):
+                await self._send(batch)
+                batch = []
+                length = 0
+                count = 0
+            batch.append((message, entities, size))
+            length += size + len(SEPARATOR)
+            count += len(entities)
+        if batch:
+            await self._send(batch)
+
+    async def _send(self, batch: List[Tuple[str, list, int]]) -> None:
+        """Join parsed logs into one message, shifting their entities."""
+        messages = []
+        entities = []
+        offset = 0
+        for message, msg_entities, size in batch:
+            for entity in msg_entities:
+                entity.offset += offset
+            messages.append(message)
+            entities.extend(msg_entities)
+            offset += size + len(SEPARATOR)
+        for chunk in split_message(SEPARATOR.join(messages), entities):
+            await self._send_parsed(*chunk)
+
+    async def _send_parsed(self, message: str, entities: list) -> None:
+        while True:
+            try:
+                await self.client(functions.messages.SendMessageRequest(
+                    peer=self.entity,
+                    message=message,
+                    no_webpage=True,
+                    silent=True,
+                    entities=entities
+                ))
+                self.sent += 1
+                return
+            except errors.FloodWaitError as e:
+                LOGGER.debug("Delaying the logs by %ds.", e.seconds)
+                await asyncio.sleep(e.seconds)
+
+    async def _get_entity(self):
+        if self.entity is None:
+            logger_group = self.client.config['userbot'].getint(
+                'logger_group_id', False
+            )
+            try:
+                self.entity = await self.client.get_input_entity(
+                    logger_group
+                )
+            except TypeError:
+                LOGGER.info("Your logger group ID is unsupported")
+            except ValueError:
+                LOGGER.info("Your logger group ID cannot be found")
+        return self.entity
@@ -0,0 +1,281 @@
+# TG-UserBot - A modular Telegram UserBot script for Python.
+# Copyright (C) 2019  Kandarp <https://github.com/kandnub>
+#
+# TG-UserBot is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# TG-UserBot is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with TG-UserBot.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import asyncio
+import contextvars
+import functools
+import json
+import logging
+import time
+from collections import Counter, deque
+from typing import Any, Deque, Dict, List, Optional
+
+from telethon import errors, TelegramClient
+from telethon.events import StopPropagation
+
+from .scheduler import interactive
+
+
+LOGGER = logging.getLogger(__name__)
+SAMPLES: int = 1000
+DUMP_INTERVAL: int = 300
+DUMP_FILE: str = 'stats.json'
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float('inf'))
+current_handler: contextvars.ContextVar = contextvars.ContextVar(
+    'current_handler', default=None
+)
+
+
+class HandlerStats:
+    """Call counts and latencies of a single handler."""
+    def __init__(self, plugin: str, name: str):
+        self.plugin = plugin
+        self.name = name
+        self.calls: int = 0
+        self.errors: int = 0
+        self.total_time: float = 0.0
+        self.cpu_time: float = 0.0
+        self.rpc_time: float = 0.0
+        self.samples: Deque[float] = deque(maxlen=SAMPLES)
+
+    def record(self, elapsed: float) -> None:
+        self.calls += 1
+        self.total_time += elapsed
+        self.samples.append(elapsed)
+
+    def percentile(self, percent: float) -> float:
+        """Latency percentile of the recent calls, in seconds."""
+        if not self.samples:
+            return 0.0
+        samples = sorted(self.samples)
+        index = round(percent / 100 * (len(samples) - 1))
+        return samples[index]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'plugin': self.plugin,
+            'handler': self.name,
+            'calls': self.calls,
+            'errors': self.errors,
+            'total_time': self.total_time,
+            'cpu_time': self.cpu_time,
+            'rpc_time': self.rpc_time,
+            'p50': self.percentile(50),
+            'p95': self.percentile(95),
+            'p99': self.percentile(99),
+        }
+
+
+class RequestStats:
+    """Counters and a latency histogram of a single request type."""
+    def __init__(self, name: str):
+        self.name = name
+        self.calls: int = 0
+        self.errors: int = 0
+        self.flood_waits: int = 0
+        self.flood_seconds: int = 0
+        self.total_time: float = 0.0
+        self.buckets: List[int] = [0] * len(LATENCY_BUCKETS)
+        self.handlers: Counter = Counter()
+
+    def record(
+        self,
+        elapsed: float,
+        handler: Optional[HandlerStats],
+        error: Exception = None
+    ) -> None:
+        self.calls += 1
+        self.total_time += elapsed
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if elapsed <= bound:
+                self.buckets[i] += 1
+                break
+        self.handlers[handler.name if handler else None] += 1
+        if isinstance(error, errors.FloodWaitError):
+            self.flood_waits += 1
+            self.flood_seconds += error.seconds
+        elif error is not None:
+            self.errors += 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'request': self.name,
+            'calls': self.calls,
+            'errors': self.errors,
+            'flood_waits': self.flood_waits,
+            'flood_seconds': self.flood_seconds,
+            'total_time': self.total_time,
+            'buckets': dict(zip(map(str, LATENCY_BUCKETS), self.buckets)),
+            'handlers': {
+                str(name): count for name, count in self.handlers.items()
+            },
+        }
+
+
+class _Timed:
+    """Drive a coroutine and time the steps it runs on the event loop."""
+    def __init__(self, coro, stats: HandlerStats):
+        self.coro = coro
+        self.stats = stats
+
+    def __await__(self):
+        value = None
+        error = None
+        while True:
+            start = time.perf_counter()
+            try:
+                if error is not None:
+                    future = self.coro.throw(error)
+                else:
+                    future = self.coro.send(value)
+            except StopIteration as e:
+                return e.value
+            finally:
+                self.stats.cpu_time += time.perf_counter() - start
+            try:
+                value = yield future
+                error = None
+            except BaseException as e:
+                value = None
+                error = e
+
+
+class Metrics:
+    """Handler and request stats of the client, dumped as JSON periodically.
+
+    Handlers are wrapped once when they're registered, requests are recorded
+    by UserBotClient.__call__ along with the handler which sent them.
+    """
+    def __init__(
+        self,
+        client: TelegramClient,
+        interval: int = DUMP_INTERVAL,
+        path: str = DUMP_FILE
+    ):
+        self.client = client
+        self.interval = interval
+        self.path = path
+        self.handlers: Dict[str, HandlerStats] = {}
+        self.requests: Dict[str, RequestStats] = {}
+        self.transfers: Counter = Counter()
+        self._task: asyncio.Task = None
+
+    def wrap(self, func: callable) -> callable:
+        """Time every call of the handler, returns the wrapped handler."""
+        if getattr(func, '_handler_stats', None):
+            return func
+
+        plugin = func.__module__.rsplit('.', 1)[-1]
+        key = f"{func.__module__}.{func.__name__}"
+        stats = self.handlers.setdefault(key, HandlerStats(plugin, key))
+
+        @functools.wraps(func)
+        async def wrapper(event):
+            token = current_handler.set(stats)
+            # Requests of the owner's commands get priority
+            owner = interactive.set(bool(getattr(event, 'out', False)))
+            start = time.perf_counter()
+            try:
+                return await _Timed(func(event), stats)
+            except StopPropagation:
+                raise
+            except Exception:
+                stats.errors += 1
+                raise
+            finally:
+                stats.record(time.perf_counter() - start)
+                current_handler.reset(token)
+                interactive.reset(owner)
+
+        wrapper._handler_stats = stats
+        return wrapper
+
+    def top(self, plugin: str = None, limit: int = 10) -> List[HandlerStats]:
+        """The handlers which took the most time, optionally of a plugin."""
+        handlers = [
+            h for h in self.handlers.values()
+            if h.calls and (plugin is None or h.plugin == plugin)
+        ]
+        handlers.sort(key=lambda h: h.total_time, reverse=True)
+        return handlers[:limit]
+
+    def record_request(
+        self, request, elapsed: float, error: Exception = None
+    ) -> None:
+        """Record a sent request, or all of them if a list was sent."""
+        handler = current_handler.get()
+        if handler is not None:
+            handler.rpc_time += elapsed
+        requests = request if isinstance(request, list) else [request]
+        for r in requests:
+            name = type(r).__name__
+            stats = self.requests.get(name, None)
+            if stats is None:
+                stats = self.requests[name] = RequestStats(name)
+            stats.record(elapsed, handler, error)
+
+    def record_transfer(
+        self, direction: str, size: int, elapsed: float
+    ) -> None:
+        """Record the bytes and seconds of a finished up or download."""
+        self.transfers[direction + '_bytes'] += size
+        self.transfers[direction + '_seconds'] += elapsed
+
+    def record_upload_cache(self, size: int, hit: bool) -> None:
+        """Record a sent-file cache lookup of a fast upload."""
+        if hit:
+            self.transfers['upload_cache_hits'] += 1
+            self.transfers['upload_cache_bytes'] += size
+        else:
+            self.transfers['upload_cache_misses'] += 1
+
+    def top_requests(self, limit: int = 10) -> List[RequestStats]:
+        """The most sent request types."""
+        requests = sorted(
+            self.requests.values(), key=lambda r: r.calls, reverse=True
+        )
+        return requests[:limit]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'time': time.time(),
+            'handlers': [h.to_dict() for h in self.handlers.values()],
+            'requests': [r.to_dict() for r in self.requests.values()],
+            'transfers': dict(self.transfers),
+        }
+
+    def dump(self) -> None:
+        """Write the current stats to the JSON file."""
+        try:
+            with open(self.path, 'w+') as f:
+                json.dump(self.to_dict(), f, indent=2)
+        except OSError as e:
+            LOGGER.debug("Couldn't dump the stats: %s", e)
+
+    def start(self) -> None:
+        """Start dumping the stats every interval seconds."""
+        if self.interval and (not self._task or self._task.done()):
+            self._task = self.client.loop.create_task(self._worker())
+
+    async def _worker(self) -> None:
+        calls = 0
+        while True:
+            await asyncio.sleep(self.interval)
+            total = sum(h.calls for h in self.handlers.values())
+            if total != calls:
+                calls = total
+                self.dump()
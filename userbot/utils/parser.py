@@ -18,6 +18,7 @@
 # This is based on the parser of https://github.com/mojurasu/kantek/
 
 
+import functools
 import re
 from typing import Dict, List, Tuple, Union
 
@@ -29,19 +30,26 @@ KWARGS = re.compile(
     r'(?P<val>\[.+?\]|(?P<q1>\'|\").+?(?P=q1)|\S+)'
 )
 ARGS = re.compile(r'(?:(?P<q>\'|\"))(.+?)(?:(?P=q))')
+REST = re.compile(r'([^\r\n\t\f\v ,]+|\[.*\])')
+INTEGER = re.compile(r'-?\d+')
+LIST = re.compile(r'^\[.*\]$')
+BRACKETS = re.compile(r'[\[\]]')
+QUOTES = re.compile(r'[\'\"]')
+TRAILING_COMMA = re.compile(r'(?<!\\), ?$')
 BOOL_MAP = {
     'false': False,
     'true': True,
 }
+CACHE_SIZE: int = 256
 
 Value = Union[int, str, float, list]
 KeywordArgument = Union[Value, range, List[Value]]
 
 
-async def _parse_arg(val: str) -> Union[int, str, float]:
+def _parse_arg(val: str) -> Union[int, str, float]:
     val = val.strip()
 
-    if re.match(r'-?\d+', val):
+    if INTEGER.match(val):
         return int(val)
 
     try:
@@ -49,35 +57,51 @@ async def _parse_arg(val: str) -> Union[int, str, float]:
     except ValueError:
         pass
 
+    if LIST.search(val):
+        values = BRACKETS.sub('', val).split(',')
+        return [_parse_arg(v.strip()) for v in values]
+
+    val = BOOL_MAP.get(val.lower(), val)
     if isinstance(val, str):
-        if re.search(r'^\[.*\]$', val):
-            val = re.sub(r'[\[\]]', '', val).split(',')
-            val = [await _parse_arg(v.strip()) for v in val]
-        else:
-            val = BOOL_MAP.get(val.lower(), val)
-    if isinstance(val, str):
-        val = re.sub(r'(?<!\\), ?$', '', val)
+        val = TRAILING_COMMA.sub('', val)
     return val
 
 
-async def parse_arguments(
-    self, arguments: str
-) -> Tuple[List[Value], Dict[str, KeywordArgument]]:
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def _parse(arguments: str) -> Tuple[tuple, tuple]:
     keyword_args = {}
     args = []
 
     for match in KWARGS.finditer(arguments):
         key = match.group('key')
-        val = await _parse_arg(re.sub(r'[\'\"]', '', match.group('val')))
-        keyword_args.update({key: val})
+        keyword_args[key] = _parse_arg(QUOTES.sub('', match.group('val')))
     arguments = KWARGS.sub('', arguments)
 
     for val in ARGS.finditer(arguments):
-        args.append(await _parse_arg(val.group(2)))
+        args.append(_parse_arg(val.group(2)))
     arguments = ARGS.sub('', arguments)
 
-    for val in re.findall(r'([^\r\n\t\f\v ,]+|\[.*\])', arguments):
-        parsed = await _parse_arg(val)
+    for val in REST.findall(arguments):
+        parsed = _parse_arg(val)
         if parsed:
             args.append(parsed)
-    return args, keyword_args
+    return tuple(args), tuple(keyword_args.items())
+
+
+def _copy(val: KeywordArgument) -> KeywordArgument:
+    return list(val) if isinstance(val, list) else val
+
+
+def parse(arguments: str) -> Tuple[List[Value], Dict[str, KeywordArgument]]:
+    """Parse the arguments synchronously, repeated strings are cached."""
+    args, keyword_args = _parse(arguments)
+    return (
+        [_copy(val) for val in args],
+        {key: _copy(val) for key, val in keyword_args}
+    )
+
+
+async def parse_arguments(
+    self, arguments: str
+) -> Tuple[List[Value], Dict[str, KeywordArgument]]:
+    return parse(arguments)
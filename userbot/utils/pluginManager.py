@@ -125,6 +125,7 @@ class PluginManager:
             for n, cb in vars(module).items():
                 if inspect.iscoroutinefunction(cb) and not n.startswith('_'):
                     if events._get_handlers(cb):
+                        cb = self.client.metrics.wrap(cb)
                         callbacks.append(Callback(n, cb))
             self.active_plugins.append(Plugin(name, callbacks, path, module))
             LOGGER.info("Successfully Imported %s", name)
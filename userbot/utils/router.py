@@ -0,0 +1,189 @@
+# TG-UserBot - A modular Telegram UserBot script for Python.
+# Copyright (C) 2019  Kandarp <https://github.com/kandnub>
+#
+# TG-UserBot is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# TG-UserBot is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with TG-UserBot.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import logging
+import re
+from typing import Callable, Dict, FrozenSet, List, Optional, Set
+
+try:
+    import re._parser as sre_parse
+    from re._constants import (
+        AT, BRANCH, IN, LITERAL, MAX_REPEAT, MIN_REPEAT, RANGE, SUBPATTERN
+    )
+except ImportError:
+    import sre_parse
+    from sre_constants import (
+        AT, BRANCH, IN, LITERAL, MAX_REPEAT, MIN_REPEAT, RANGE, SUBPATTERN
+    )
+
+
+LOGGER = logging.getLogger(__name__)
+DEFAULT_PREFIX = r"[^/!#@\$A-Za-z0-9]"
+MAX_RANGE = 128
+
+
+class CommandRouter:
+    """Compile every command pattern once per prefix and index them.
+
+    Each prefixed pattern is indexed by the characters it can start with,
+    so a message only runs the patterns of the commands which can match.
+    """
+    def __init__(self):
+        self.builders: List[object] = []
+        self.prefix: str = None
+        self.built: bool = False
+        self._prefix_match: Callable = None
+        self._patterns: Dict[object, Callable] = {}
+        self._index: Dict[str, FrozenSet[object]] = {}
+        self._wildcards: FrozenSet[object] = frozenset()
+        self._last_text: str = None
+        self._last_candidates: FrozenSet[object] = frozenset()
+
+    def add(self, builder) -> None:
+        """Add a builder with a regex to the router."""
+        self.builders.append(builder)
+        self.built = False
+
+    def rebuild(self, prefix: str = None) -> None:
+        """Compile all the patterns for the given prefix."""
+        self.prefix = prefix
+        if prefix:
+            prefix = re.escape(prefix)
+        else:
+            prefix = DEFAULT_PREFIX
+
+        index: Dict[str, Set[object]] = {}
+        wildcards: Set[object] = set()
+        self._patterns.clear()
+        for builder in self.builders:
+            exp, flags = builder.regex
+            if builder.disable_prefix:
+                self._patterns[builder] = re.compile(exp, flags).finditer
+                continue
+            self._patterns[builder] = re.compile(
+                "(?i)^" + prefix + exp, flags=flags
+            ).finditer
+            chars = None
+            if not flags & re.MULTILINE:
+                chars = first_chars(exp, flags)
+            if chars is None:
+                wildcards.add(builder)
+            else:
+                for char in chars:
+                    index.setdefault(char, set()).add(builder)
+
+        self._wildcards = frozenset(wildcards)
+        self._index = {
+            char: frozenset(builders | wildcards)
+            for char, builders in index.items()
+        }
+        self._prefix_match = re.compile("(?i)^" + prefix).match
+        self._last_text = None
+        self.built = True
+        LOGGER.debug(
+            "Compiled %d patterns for %d characters.",
+            len(self._patterns), len(self._index)
+        )
+
+    def match(self, builder, prefix: str, text: str) -> Optional[list]:
+        """Return the matches of a builder's pattern or None."""
+        if not self.built or prefix != self.prefix:
+            self.rebuild(prefix)
+
+        if not builder.disable_prefix:
+            if builder not in self._candidates(text):
+                return None
+        return list(self._patterns[builder](text)) or None
+
+    def _candidates(self, text: str) -> FrozenSet[object]:
+        """Get the builders which can match the text, once per message."""
+        if text is self._last_text or text == self._last_text:
+            return self._last_candidates
+
+        candidates = frozenset()
+        match = self._prefix_match(text)
+        if match:
+            char = text[match.end():match.end() + 1].lower()
+            candidates = self._index.get(char, self._wildcards)
+        self._last_text = text
+        self._last_candidates = candidates
+        return candidates
+
+
+def first_chars(exp: str, flags: int = 0) -> Optional[Set[str]]:
+    """Lowercase characters a pattern can start with or None if unknown."""
+    try:
+        parsed = sre_parse.parse(exp, flags)
+    except Exception:
+        return None
+    chars, nullable = _first_chars(list(parsed))
+    if chars is None or nullable:
+        return None
+    return chars
+
+
+def _first_chars(items: list) -> tuple:
+    """Walk the parsed items until one of them can't match an empty string."""
+    chars: Set[str] = set()
+    for op, av in items:
+        if op is LITERAL:
+            chars.add(chr(av).lower())
+            return chars, False
+        elif op is IN:
+            found = _in_chars(av)
+            if found is None:
+                return None, False
+            chars.update(found)
+            return chars, False
+        elif op is AT:
+            continue
+        elif op is SUBPATTERN:
+            found, nullable = _first_chars(list(av[-1]))
+        elif op is BRANCH:
+            found, nullable = set(), False
+            for branch in av[1]:
+                sub, sub_nullable = _first_chars(list(branch))
+                if sub is None:
+                    return None, False
+                found.update(sub)
+                nullable = nullable or sub_nullable
+        elif op in (MAX_REPEAT, MIN_REPEAT):
+            minimum, _, sub = av
+            found, nullable = _first_chars(list(sub))
+            nullable = nullable or minimum == 0
+        else:  # ANY, NOT_LITERAL, CATEGORY, GROUPREF, ASSERT ...
+            return None, False
+
+        if found is None:
+            return None, False
+        chars.update(found)
+        if not nullable:
+            return chars, False
+    return chars, True
+
+
+def _in_chars(items: list) -> Optional[Set[str]]:
+    """Characters of a character set if it's small enough to list."""
+    chars: Set[str] = set()
+    for op, av in items:
+        if op is LITERAL:
+            chars.add(chr(av).lower())
+        elif op is RANGE and av[1] - av[0] <= MAX_RANGE:
+            chars.update(chr(c).lower() for c in range(av[0], av[1] + 1))
+        else:
+            return None
+    return chars
@@ -0,0 +1,174 @@
+# TG-UserBot - A modular Telegram UserBot script for Python.
+# Copyright (C) 2019  Kandarp <https://github.com/kandnub>
+#
+# TG-UserBot is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# TG-UserBot is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with TG-UserBot.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import asyncio
+import contextvars
+import logging
+import time
+from collections import Counter
+from typing import Awaitable, Callable, Dict, Hashable, List, Optional
+
+from telethon import errors, TelegramClient
+from telethon.utils import get_peer_id
+
+
+LOGGER = logging.getLogger(__name__)
+MAX_RETRIES: int = 3
+MAX_WAIT: int = 300
+MIN_RATE: float = 1 / 60
+MAX_RATE: float = 30.0
+BURST: float = 5.0
+RESERVED: float = 1.0
+RECOVERY: float = 0.05
+interactive: contextvars.ContextVar = contextvars.ContextVar(
+    'interactive', default=False
+)
+scheduled: contextvars.ContextVar = contextvars.ContextVar(
+    'scheduled', default=False
+)
+
+
+class TokenBucket:
+    """A rate limit learned from the FloodWaits of a method or a chat."""
+    def __init__(self, rate: float, capacity: float = BURST):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.blocked_until: float = 0.0
+        self.updated = time.monotonic()
+
+    def delay(self, reserve: float = 0.0) -> float:
+        """Seconds until a token can be taken, leaving ``reserve`` tokens."""
+        now = time.monotonic()
+        if now > self.updated:
+            self.tokens = min(
+                self.capacity, self.tokens + (now - self.updated) * self.rate
+            )
+            self.updated = now
+        if self.blocked_until > now:
+            return self.blocked_until - now
+        missing = 1 + reserve - self.tokens
+        return missing / self.rate if missing > 0 else 0.0
+
+    def take(self) -> None:
+        self.tokens -= 1
+
+    def flood(self, seconds: int) -> None:
+        """Back off after a FloodWait and halve the rate."""
+        self.blocked_until = self.updated = time.monotonic() + seconds
+        self.tokens = 0
+        self.rate = max(MIN_RATE, self.rate / 2)
+
+    def succeed(self) -> None:
+        self.rate = min(MAX_RATE, self.rate + RECOVERY)
+
+
+class RequestScheduler:
+    """Pace the requests of the methods and chats which hit FloodWaits.
+
+    Requests are only delayed once a FloodWait was observed for their
+    method or chat. Requests of outgoing (owner) commands can use every
+    token, background requests leave ``RESERVED`` tokens for them.
+    FloodWaits are retried automatically if they're short enough.
+    """
+    def __init__(self, client: TelegramClient):
+        self.client = client
+        self.buckets: Dict[Hashable, TokenBucket] = {}
+        self.stats: Counter = Counter()
+
+    async def call(
+        self, sender: Callable[..., Awaitable], request, *args, **kwargs
+    ):
+        """Send the request through ``sender`` once its buckets allow it."""
+        if isinstance(request, list):
+            return await self._send(sender, request, *args, **kwargs)
+
+        keys = self._keys(request)
+        for attempt in range(MAX_RETRIES + 1):
+            await self._acquire(keys)
+            try:
+                result = await self._send(sender, request, *args, **kwargs)
+            except errors.FloodWaitError as e:
+                self._flood(keys, e.seconds)
+                if attempt == MAX_RETRIES or e.seconds > MAX_WAIT:
+                    raise
+                self.stats['retried'] += 1
+                LOGGER.debug(
+                    "Retrying %s in %ds.", type(request).__name__, e.seconds
+                )
+                continue
+            for key in keys:
+                bucket = self.buckets.get(key, None)
+                if bucket:
+                    bucket.succeed()
+            return result
+
+    @staticmethod
+    async def _send(sender: Callable[..., Awaitable], *args, **kwargs):
+        # Mark the request as paced for the client's _call
+        token = scheduled.set(True)
+        try:
+            return await sender(*args, **kwargs)
+        finally:
+            scheduled.reset(token)
+
+    async def _acquire(self, keys: List[Hashable]) -> None:
+        reserve = 0.0 if interactive.get() else RESERVED
+        while True:
+            delay = max(
+                (self.buckets[k].delay(reserve) for k in keys
+                 if k in self.buckets),
+                default=0.0
+            )
+            if delay <= 0:
+                break
+            self.stats['delayed'] += 1
+            await asyncio.sleep(delay)
+        for key in keys:
+            bucket = self.buckets.get(key, None)
+            if bucket:
+                bucket.take()
+
+    def _flood(self, keys: List[Hashable], seconds: int) -> None:
+        self.stats['flood_waits'] += 1
+        # The most specific key, the chat's one if there is one
+        key = keys[-1]
+        bucket = self.buckets.get(key, None)
+        if bucket is None:
+            bucket = self.buckets[key] = TokenBucket(
+                max(MIN_RATE, BURST / max(seconds, 1))
+            )
+        bucket.flood(seconds)
+
+    @staticmethod
+    def _keys(request) -> List[Hashable]:
+        method = type(request).__name__
+        keys: List[Hashable] = [method]
+        chat = _chat_id(request)
+        if chat is not None:
+            keys.append((method, chat))
+        return keys
+
+
+def _chat_id(request) -> Optional[int]:
+    peer = getattr(request, 'peer', None) or getattr(request, 'channel', None)
+    if peer is None:
+        return None
+    try:
+        return get_peer_id(peer)
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,120 @@
+# TG-UserBot - A modular Telegram UserBot script for Python.
+# Copyright (C) 2019  Kandarp <https://github.com/kandnub>
+#
+# TG-UserBot is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# TG-UserBot is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with TG-UserBot.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import asyncio
+import base64
+import dill
+import logging
+import math
+import os
+import time
+from typing import Dict, List, Sequence, Union
+
+from telethon import TelegramClient
+from telethon.tl import custom
+
+
+LOGGER = logging.getLogger(__name__)
+TICK: int = 1
+ENV_KEY: str = 'userbot_self_destructs'
+
+
+class SelfDestructWheel:
+    """Delete messages after a timeout from a single timer wheel.
+
+    Messages which are due in the same tick are deleted with one request
+    per chat. Pending deletions are kept in the environment on restarts.
+    """
+    def __init__(self, client: TelegramClient):
+        self.client = client
+        self.wheel: Dict[int, Dict[int, List[int]]] = {}
+        self.deleted: int = 0
+        self.requests: int = 0
+        self._task: asyncio.Task = None
+        self._wakeup: asyncio.Event = None
+        self.load()
+
+    def schedule(
+        self,
+        messages: Union[custom.Message, Sequence[custom.Message]],
+        timeout: Union[int, float]
+    ) -> None:
+        """Delete the message(s) after the timeout in seconds."""
+        if not isinstance(messages, list):
+            messages = [messages]
+        tick = math.ceil((time.time() + timeout) / TICK)
+        chats = self.wheel.setdefault(tick, {})
+        for message in messages:
+            if message:
+                chats.setdefault(message.chat_id, []).append(message.id)
+        self.start()
+        if self._wakeup:
+            self._wakeup.set()
+
+    @property
+    def pending(self) -> int:
+        """The number of messages which haven't been deleted yet."""
+        return sum(
+            len(ids) for chats in self.wheel.values() for ids in chats.values()
+        )
+
+    def start(self) -> None:
+        """Start the worker if there are pending deletions."""
+        if self.wheel and (not self._task or self._task.done()):
+            self._task = self.client.loop.create_task(self._worker())
+
+    def dump(self) -> None:
+        """Store the pending deletions for the restarted script."""
+        if self.wheel:
+            data = base64.b64encode(dill.dumps(self.wheel)).decode()
+            os.environ[ENV_KEY] = data
+
+    def load(self) -> None:
+        """Load the pending deletions of the script before a restart."""
+        data = os.environ.pop(ENV_KEY, None)
+        if data:
+            try:
+                wheel = dill.loads(base64.b64decode(data.encode()))
+            except Exception as e:
+                LOGGER.debug("Couldn't load the self destructs: %s", e)
+                return
+            for tick, chats in wheel.items():
+                for chat, ids in chats.items():
+                    self.wheel.setdefault(tick, {}).setdefault(
+                        chat, []
+                    ).extend(ids)
+
+    async def _worker(self) -> None:
+        self._wakeup = asyncio.Event()
+        while self.wheel:
+            tick = min(self.wheel)
+            delay = tick * TICK - time.time()
+            if delay > 0:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            for chat, ids in self.wheel.pop(tick).items():
+                try:
+                    await self.client.delete_messages(chat, ids)
+                    self.deleted += len(ids)
+                    self.requests += 1
+                except Exception as e:
+                    LOGGER.debug("Couldn't delete %s in %s: %s", ids, chat, e)
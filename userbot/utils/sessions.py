@@ -19,25 +19,36 @@
 # since it hasn't been updated for a while now and missed a few things.
 
 
+import concurrent.futures
+import json
 import logging
+from typing import Dict, Iterable, Optional, Tuple
 
 import redis
 
+from telethon import utils
 from telethon.crypto import AuthKey
 from telethon.sessions import MemorySession
-"""
-from telethon import utils
 from telethon.sessions.memory import _SentFileType
 from telethon.tl import types
-"""
+
+from .cache import LRUCache
 
 
 LOGGER = logging.getLogger(__name__)
+ENTITY_CACHE_SIZE: int = 4096
+FILE_CACHE_SIZE: int = 1024
+NEGATIVE_TTL: float = 60.0
+MISSING: tuple = ()
 
 
 class RedisSession(MemorySession):
     """Session to store the authentication information in Redis.
-    The entities and files are cached in memory instead of Redis.
+    The entities are stored in a Redis hash with their indexed values and
+    in username, phone and name indexes, behind a bounded in-memory LRU
+    which also remembers unknown ones for a while. They're written by a
+    background thread so the event loop doesn't wait for Redis. Sent files
+    are stored in a Redis hash keyed by their MD5, size and type.
     """
     def __init__(self, session_name=None, redis_connection=None):
         if not isinstance(session_name, (str, bytes)):
@@ -68,10 +79,26 @@ class RedisSession(MemorySession):
         self.sess_prefix = "telethon:session:{}".format(self.session_name)
         self.feed_session()
 
-        self._files = {}
+        self._files = LRUCache(maxsize=FILE_CACHE_SIZE)
         self._entities = set()
         self._update_states = {}
 
+        self.entities_key = "{}:entities".format(self.sess_prefix)
+        self.index_keys = {
+            'username': "{}:usernames".format(self.sess_prefix),
+            'phone': "{}:phones".format(self.sess_prefix),
+            'name': "{}:names".format(self.sess_prefix),
+        }
+        # Marked ID -> (hash, username, phone, name) and index -> marked ID,
+        # unknown ones are cached as MISSING and 0 for NEGATIVE_TTL
+        self._entity_rows = LRUCache(maxsize=ENTITY_CACHE_SIZE)
+        self._entity_index = LRUCache(maxsize=ENTITY_CACHE_SIZE)
+        # One thread keeps the writes in order
+        self._writer = concurrent.futures.ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix='RedisSession'
+        )
+        self.files_key = "{}:sent_files".format(self.sess_prefix)
+
     def feed_session(self):
         try:
             s = self._get_sessions()
@@ -168,157 +195,191 @@ class RedisSession(MemorySession):
         self.redis_connection.delete(*keys)
         pass
 
-    """
-    def get_update_state(self, entity_id):
-        key_pattern = "{}:update_states:{}".format(self.sess_prefix, entity_id)
-        return self.redis_connection.get(key_pattern)
-
-    def set_update_state(self, entity_id, state):
-        key_pattern = "{}:update_states:{}".format(self.sess_prefix, entity_id)
-        self.redis_connection.set(key_pattern, state)
-
-    def _get_entities(self, strip_prefix=False):
-        key_pattern = "{}:entities:".format(self.sess_prefix)
-        try:
-            entities = self.redis_connection.keys(key_pattern+"*")
-            if not strip_prefix:
-                return entities
-            return [s.decode().replace(key_pattern, "") for s in entities]
-        except Exception as ex:
-            LOGGER.exception(ex.args)
-            return []
-
     def process_entities(self, tlo):
+        """Cache the new or changed entities and store them in a thread"""
         rows = self._entities_to_rows(tlo)
-        if not rows or len(rows) == 0 or len(rows[0]) == 0:
+        if not rows:
             return
 
+        changed = []
+        for id, hash, *values in rows:
+            row = (hash, *values)
+            cached = self._entity_rows.get(id, None)
+            if cached == row:
+                continue
+            self._entity_rows.set(id, row)
+            for field, value in zip(self.index_keys, values):
+                if value:
+                    self._entity_index.set((field, value), id)
+            # Without a cached row the stored one is read by the writer
+            changed.append((id, row, cached))
+
+        if changed:
+            self._writer.submit(self._store_rows, changed)
+
+    def close(self):
+        """Wait for the entities which are still being stored"""
+        self._writer.submit(lambda: None).result()
+
+    def _store_rows(self, changed: list) -> None:
+        """Store the rows and remove their stale indexes in one pipeline"""
         try:
-            for row in rows:
-                key = "{}:entities:{}".format(self.sess_prefix, row[0])
-                s = {
-                    "id": row[0],
-                    "hash": row[1],
-                    "username": row[2] or b'',
-                    "phone": row[3] or b'',
-                    "name": row[4] or b'',
-                }
-                self.redis_connection.hmset(key, s)
+            unknown = [id for id, _, old in changed if old is None]
+            stored = self._read_rows(unknown) if unknown else {}
+            pipe = self.redis_connection.pipeline(transaction=False)
+            for id, row, old in changed:
+                if old is None:
+                    old = stored.get(id, MISSING)
+                pipe.hset(self.entities_key, id, json.dumps(row))
+                old_values = old[1:] or (None,) * len(self.index_keys)
+                for field, value, old_value in zip(
+                    self.index_keys, row[1:], old_values
+                ):
+                    if old_value and old_value != value:
+                        pipe.hdel(self.index_keys[field], old_value)
+                    if value:
+                        pipe.hset(self.index_keys[field], value, id)
+            pipe.execute()
         except Exception as ex:
             LOGGER.exception(ex.args)
 
     def get_entity_rows_by_phone(self, phone):
-        try:
-            for key in self._get_entities():
-                entity = self.redis_connection.hgetall(key)
-                p = (
-                    entity.get(b'phone').decode()
-                    if entity.get(b'phone') else
-                    None
-                )
-                if p and p == phone:
-                    return (
-                        int(entity.get(b'id').deocde()),
-                        int(entity.get(b'hash').decode())
-                    )
-        except Exception as ex:
-            LOGGER.exception(ex.args)
-        return None
+        return self._get_entity_rows_by_index('phone', phone)
 
     def get_entity_rows_by_username(self, username):
-        try:
-            for key in self._get_entities():
-                entity = self.redis_connection.hgetall(key)
-                u = (
-                    entity.get(b'username').decode()
-                    if entity.get(b'username') else
-                    None
-                )
-                if u and u == username:
-                    return (
-                        int(entity.get(b'id').deocde()),
-                        int(entity.get(b'hash').decode())
-                    )
-        except Exception as ex:
-            LOGGER.exception(ex.args)
-        return None
+        return self._get_entity_rows_by_index('username', username)
 
     def get_entity_rows_by_name(self, name):
-        try:
-            for key in self._get_entities():
-                entity = self.redis_connection.hgetall(key)
-                n = (
-                    entity.get(b'name').decode()
-                    if entity.get(b'name') else
-                    None
-                )
-                if n and n == name:
-                    return (
-                        int(entity.get(b'id').deocde()),
-                        int(entity.get(b'hash').decode())
-                    )
-        except Exception as ex:
-            LOGGER.exception(ex.args)
-        return None
+        return self._get_entity_rows_by_index('name', name)
 
     def get_entity_rows_by_id(self, id, exact=True):
         if exact:
-            key = "{}:entities:{}".format(self.sess_prefix, id)
-            s = self.redis_connection.hgetall(key)
-            if not s:
-                return None
-            try:
-                return id, int(s.get(b'hash').decode())
-            except Exception as ex:
-                LOGGER.exception(ex.args)
-                return None
+            ids = (id,)
         else:
             ids = (
                 utils.get_peer_id(types.PeerUser(id)),
                 utils.get_peer_id(types.PeerChat(id)),
                 utils.get_peer_id(types.PeerChannel(id))
             )
+        for marked_id in ids:
+            hash = self._get_entity_hash(marked_id)
+            if hash is not None:
+                return marked_id, hash
+
+    def _get_entity_rows_by_index(
+        self, field: str, value: str
+    ) -> Optional[Tuple[int, int]]:
+        id = self._entity_index.get((field, value), None)
+        if id is None:
             try:
-                for key in self._get_entities():
-                    entity = self.redis_connection.hgetall(key)
-                    ID = entity.get(b'id').decode()
-                    if ID and ID in ids:
-                        return ID, int(entity.get(b'hash').decode())
+                id = self.redis_connection.hget(self.index_keys[field], value)
             except Exception as ex:
                 LOGGER.exception(ex.args)
+                return None
+            if id is None:
+                self._entity_index.set((field, value), 0, ttl=NEGATIVE_TTL)
+                return None
+            id = int(id)
+            self._entity_index.set((field, value), id)
+        elif not id:
+            return None
+
+        row = self._get_entity_row(id)
+        if row is None:
+            return None
+        indexed = row[1 + list(self.index_keys).index(field)]
+        if indexed is not None and indexed != value:
+            # The entity changed since the index entry was read
+            self._entity_index.pop((field, value))
+            return None
+        return id, row[0]
+
+    def _get_entity_hash(self, id: int) -> Optional[int]:
+        row = self._get_entity_row(id)
+        return row[0] if row else None
+
+    def _get_entity_row(self, id: int) -> Optional[tuple]:
+        row = self._entity_rows.get(id, None)
+        if row is None:
+            try:
+                row = self._read_rows((id,)).get(id, MISSING)
+            except Exception as ex:
+                LOGGER.exception(ex.args)
+                return None
+            self._entity_rows.set(
+                id, row, ttl=None if row else NEGATIVE_TTL
+            )
+        return row or None
+
+    def _read_rows(
+        self, ids: Iterable[int]
+    ) -> Dict[int, Tuple[int, str, str, str]]:
+        """Read the stored rows of the entities in one HMGET"""
+        ids = list(ids)
+        rows = {}
+        for id, value in zip(
+            ids, self.redis_connection.hmget(self.entities_key, ids)
+        ):
+            if value is None:
+                continue
+            value = json.loads(value)
+            if isinstance(value, int):
+                # Older sessions only stored the hash
+                rows[id] = (value, None, None, None)
+            else:
+                rows[id] = tuple(value)
+        return rows
+
+    """
+    def get_update_state(self, entity_id):
+        key_pattern = "{}:update_states:{}".format(self.sess_prefix, entity_id)
+        return self.redis_connection.get(key_pattern)
+
+    def set_update_state(self, entity_id, state):
+        key_pattern = "{}:update_states:{}".format(self.sess_prefix, entity_id)
+        self.redis_connection.set(key_pattern, state)
+    """
 
     def cache_file(self, md5_digest, file_size, instance):
         if not isinstance(instance, (types.InputDocument, types.InputPhoto)):
             raise TypeError('Cannot cache %s instance' % type(instance))
 
-        key = "{}:sent_files:{}".format(self.sess_prefix, md5_digest)
-        s = {
-            'md5_digest': md5_digest,
-            'file_size': file_size,
-            'type': _SentFileType.from_type(type(instance)),
-            'id': instance.id,
-            'access_hash': instance.access_hash,
-        }
+        key = _file_key(md5_digest, file_size, type(instance))
+        value = (
+            instance.id, instance.access_hash, instance.file_reference or b''
+        )
+        if self._files.get(key, None) == value:
+            return
+        self._files.set(key, value)
         try:
-            self.redis_connection.hmset(key, s)
+            self.redis_connection.hset(
+                self.files_key, key, "{}:{}:{}".format(
+                    value[0], value[1], value[2].hex()
+                )
+            )
         except Exception as ex:
             LOGGER.exception(ex.args)
 
     def get_file(self, md5_digest, file_size, cls):
-        key = "{}:sent_files:{}".format(self.sess_prefix, md5_digest)
-        s = self.redis_connection.hgetall(key)
-        if s:
+        key = _file_key(md5_digest, file_size, cls)
+        value = self._files.get(key, None)
+        if value is None:
             try:
-                if (
-                    s.get(b'md5_digest').decode() == md5_digest and
-                    s.get(b'file_size').decode() == file_size and
-                    s.get(b'type').decode() == _SentFileType.from_type(cls)
-                ):
-                    return (cls(
-                        s.get(b'id').decode(),
-                        s.get(b'access_hash').decode()
-                    ))
+                row = self.redis_connection.hget(self.files_key, key)
             except Exception as ex:
                 LOGGER.exception(ex.args)
                 return None
-    """
+            if row is None:
+                return None
+            id, access_hash, file_reference = row.decode().split(':')
+            value = (int(id), int(access_hash), bytes.fromhex(file_reference))
+            self._files.set(key, value)
+        return cls(*value)
+
+
+def _file_key(md5_digest, file_size, cls) -> str:
+    if isinstance(md5_digest, bytes):
+        md5_digest = md5_digest.hex()
+    return "{}:{}:{}".format(
+        md5_digest, file_size, _SentFileType.from_type(cls).value
+    )
@@ -0,0 +1,97 @@
+# TG-UserBot - A modular Telegram UserBot script for Python.
+# Copyright (C) 2019  Kandarp <https://github.com/kandnub>
+#
+# TG-UserBot is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# TG-UserBot is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with TG-UserBot.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import asyncio
+from collections import Counter
+from typing import Awaitable, Callable, Dict, Hashable, Type
+
+from telethon import TelegramClient, utils
+from telethon.tl import functions
+from telethon.tl.tlobject import TLRequest
+
+from .cache import LRUCache
+
+
+CACHE_SIZE: int = 512
+# File parts are never identical and are expensive to serialize twice
+UNCOALESCED = (
+    functions.upload.SaveFilePartRequest,
+    functions.upload.SaveBigFilePartRequest,
+)
+# Read-only request types whose results are cached, and for how long
+CACHED: Dict[Type[TLRequest], float] = {
+    # get_entity(username), e.g. for the mentions of every blacklist check
+    functions.contacts.ResolveUsernameRequest: 60,
+}
+
+
+class SingleFlight:
+    """Share one network call between identical concurrent requests.
+
+    Requests are identical if their serialized TL bytes are equal. Results
+    of read-only request types in ``CACHED``, or opted in with
+    ``cache_results``, are cached for a TTL.
+    """
+    def __init__(self, client: TelegramClient):
+        self.client = client
+        self.ttls: Dict[Type[TLRequest], float] = dict(CACHED)
+        self.cache = LRUCache(maxsize=CACHE_SIZE)
+        self.stats: Counter = Counter()
+        self._pending: Dict[Hashable, asyncio.Task] = {}
+
+    def cache_results(self, request_type: Type[TLRequest], ttl: float) -> None:
+        """Opt a read-only request type into caching its results."""
+        self.ttls[request_type] = ttl
+
+    async def call(
+        self, sender: Callable[..., Awaitable], request, *args, **kwargs
+    ):
+        """Send the request through ``sender`` unless it's already sent."""
+        if isinstance(request, (list, UNCOALESCED)):
+            return await sender(request, *args, **kwargs)
+
+        # Requests can still hold raw IDs or entities until they're resolved
+        if isinstance(request, TLRequest):
+            await request.resolve(self.client, utils)
+        try:
+            key = (bytes(request), args, tuple(sorted(kwargs.items())))
+            hash(key)
+        except Exception:
+            # Anything that can't be serialized is sent without coalescing
+            return await sender(request, *args, **kwargs)
+
+        ttl = self.ttls.get(type(request), None)
+        if ttl is not None and key in self.cache:
+            self.stats['cached'] += 1
+            return self.cache.get(key)
+
+        task = self._pending.get(key, None)
+        if task is None:
+            self.stats['sent'] += 1
+            task = self.client.loop.create_task(
+                sender(request, *args, **kwargs)
+            )
+            task.add_done_callback(lambda t: self._done(key, t, ttl))
+            self._pending[key] = task
+        else:
+            self.stats['coalesced'] += 1
+        return await asyncio.shield(task)
+
+    def _done(self, key: Hashable, task: asyncio.Task, ttl: float) -> None:
+        self._pending.pop(key, None)
+        if ttl is not None and not task.cancelled() and not task.exception():
+            self.cache.set(key, task.result(), ttl)
@@ -0,0 +1,116 @@
+# TG-UserBot - A modular Telegram UserBot script for Python.
+# Copyright (C) 2019  Kandarp <https://github.com/kandnub>
+#
+# TG-UserBot is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# TG-UserBot is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with TG-UserBot.  If not, see <https://www.gnu.org/licenses/>.
+
+
+import asyncio
+import logging
+import os.path
+import sys
+import threading
+import time
+import traceback
+from typing import List
+
+from telethon import TelegramClient
+
+
+LOGGER = logging.getLogger(__name__)
+INTERVAL: float = 0.5
+THRESHOLD: float = 0.25
+PLUGINS_DIR: str = os.path.join('userbot', 'plugins')
+
+
+class LoopWatchdog:
+    """Measure how late the event loop wakes up a sleeping task.
+
+    In debug mode a thread also checks the task's heartbeat and logs the
+    loop thread's stack, with the plugin it's in, when the loop is blocked
+    for longer than ``threshold`` seconds.
+    """
+    def __init__(
+        self,
+        client: TelegramClient,
+        interval: float = INTERVAL,
+        threshold: float = THRESHOLD
+    ):
+        self.client = client
+        self.interval = interval
+        self.threshold = threshold
+        self.debug = False
+        self.lag: float = 0.0
+        self.max_lag: float = 0.0
+        self.stalls: int = 0
+        self.blocking_calls: int = 0
+        self._beat: float = time.monotonic()
+        self._loop_thread: int = None
+        self._task: asyncio.Task = None
+        self._thread: threading.Thread = None
+
+    def start(self) -> None:
+        """Start the watchdog, this has to be called from the loop's thread."""
+        if self._task and not self._task.done():
+            return
+        # The config is only assigned to the client after it's created
+        config = self.client.config['userbot']
+        self.threshold = config.getfloat('loop_lag_threshold', self.threshold)
+        self.debug = config.getboolean('loop_debug', False)
+        self._loop_thread = threading.get_ident()
+        self._task = self.client.loop.create_task(self._worker())
+        if self.debug and not self._thread:
+            self._thread = threading.Thread(
+                target=self._monitor, name='LoopWatchdog', daemon=True
+            )
+            self._thread.start()
+
+    async def _worker(self) -> None:
+        while True:
+            self._beat = start = time.monotonic()
+            await asyncio.sleep(self.interval)
+            self.lag = max(time.monotonic() - start - self.interval, 0.0)
+            self.max_lag = max(self.max_lag, self.lag)
+            if self.lag > self.threshold:
+                self.stalls += 1
+                LOGGER.debug("The event loop lagged by %.3fs.", self.lag)
+
+    def _monitor(self) -> None:
+        reported = None
+        while True:
+            time.sleep(self.threshold / 2)
+            beat = self._beat
+            blocked = time.monotonic() - beat - self.interval
+            if blocked < self.threshold or beat == reported:
+                continue
+
+            reported = beat
+            frame = sys._current_frames().get(self._loop_thread, None)
+            if frame is None:
+                continue
+            stack = traceback.extract_stack(frame)
+            self.blocking_calls += 1
+            LOGGER.warning(
+                "The event loop has been blocked for %.3fs in %s:\n%s",
+                blocked, _plugin(stack), ''.join(traceback.format_list(stack))
+            )
+
+
+def _plugin(stack: List[traceback.FrameSummary]) -> str:
+    """The innermost plugin function of the stack, if there is one."""
+    for summary in reversed(stack):
+        if PLUGINS_DIR in summary.filename:
+            name = os.path.basename(summary.filename)[:-3]
+            return f"plugin {name} ({summary.name}:{summary.lineno})"
+    summary = stack[-1]
+    return f"{os.path.basename(summary.filename)} ({summary.name})"